@@ -22,15 +22,27 @@ def create_user(db: Session, username: str, password: str):
         db.rollback()
         raise e
 
+def update_user_password(db: Session, user: User, password: str):
+    # Password is already hashed with bcrypt before being passed here
+    try:
+        user.password = password
+        db.commit()
+        db.refresh(user)
+        return user
+    except Exception as e:
+        db.rollback()
+        raise e
+
 # =========================
 # Images CRUD
 # =========================
-def create_image(db: Session, filename: str, image_url: str, user_id: int):
+def create_image(db: Session, filename: str, image_url: str, user_id: int, metadata: dict = None):
     try:
         image = Image(
             filename=filename,
             image_url=image_url,
-            user_id=user_id
+            user_id=user_id,
+            **(metadata or {})
         )
         db.add(image)
         db.commit()
@@ -40,5 +52,89 @@ def create_image(db: Session, filename: str, image_url: str, user_id: int):
         db.rollback()
         raise e
 
-def get_user_images(db: Session, user_id: int):
-    return db.query(Image).filter(Image.user_id == user_id).all()
+def create_images_bulk(db: Session, user_id: int, items: list):
+    """Insert many images in a single transaction; items hold filename, image_url, metadata.
+
+    Returns id/filename/image_url dicts read after the flush, so the caller
+    does not reload every expired row after the commit.
+    """
+    try:
+        images = [
+            Image(
+                filename=item["filename"],
+                image_url=item["image_url"],
+                user_id=user_id,
+                **(item.get("metadata") or {})
+            )
+            for item in items
+        ]
+        db.add_all(images)
+        db.flush()
+        created = [
+            {"id": img.id, "filename": img.filename, "image_url": img.image_url}
+            for img in images
+        ]
+        db.commit()
+        return created
+    except Exception as e:
+        db.rollback()
+        raise e
+
+# Columns /api/images may sort by
+IMAGE_SORT_COLUMNS = {
+    "created_at": Image.created_at,
+    "taken_at": Image.taken_at,
+    "width": Image.width,
+    "height": Image.height,
+    "byte_size": Image.byte_size,
+    "filename": Image.filename,
+}
+
+def get_user_images(db: Session, user_id: int, filters: dict = None, sort: str = None, descending: bool = False):
+    """List a user's images, filtered and sorted on the indexed metadata columns"""
+    query = db.query(Image).filter(Image.user_id == user_id)
+    filters = filters or {}
+
+    if filters.get("format"):
+        query = query.filter(Image.format == filters["format"].upper())
+    if filters.get("camera"):
+        query = query.filter(Image.camera == filters["camera"])
+    if filters.get("has_gps") is not None:
+        query = query.filter(Image.has_gps == filters["has_gps"])
+    if filters.get("min_width") is not None:
+        query = query.filter(Image.width >= filters["min_width"])
+    if filters.get("max_width") is not None:
+        query = query.filter(Image.width <= filters["max_width"])
+    if filters.get("min_height") is not None:
+        query = query.filter(Image.height >= filters["min_height"])
+    if filters.get("max_height") is not None:
+        query = query.filter(Image.height <= filters["max_height"])
+    if filters.get("taken_after") is not None:
+        query = query.filter(Image.taken_at >= filters["taken_after"])
+    if filters.get("taken_before") is not None:
+        query = query.filter(Image.taken_at <= filters["taken_before"])
+
+    if sort in IMAGE_SORT_COLUMNS:
+        column = IMAGE_SORT_COLUMNS[sort]
+        query = query.order_by(column.desc() if descending else column.asc(), Image.id)
+
+    return query.all()
+
+def get_image(db: Session, image_id: int):
+    return db.query(Image).filter(Image.id == image_id).first()
+
+def get_images_by_ids(db: Session, image_ids: list):
+    return db.query(Image).filter(Image.id.in_(image_ids)).all()
+
+def get_image_hashes(db: Session, user_id: int, after_id: int = 0):
+    """(id, perceptual_hash) pairs only, so building the similarity index never loads full rows"""
+    return (
+        db.query(Image.id, Image.perceptual_hash)
+        .filter(
+            Image.user_id == user_id,
+            Image.id > after_id,
+            Image.perceptual_hash.isnot(None)
+        )
+        .order_by(Image.id)
+        .all()
+    )
@@ -1,10 +1,16 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
+import threading
+import time
 
 # SQLite database
 # Use environment variable if available (for Railway/cloud), otherwise use local path
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+# Heroku/Railway style URLs use the scheme SQLAlchemy 2 no longer accepts
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
 # Ensure database directory exists for SQLite
 if DATABASE_URL.startswith("sqlite"):
@@ -20,13 +26,83 @@ if DATABASE_URL.startswith("sqlite"):
             # File in current directory, no need to create directory
             pass
 
+# =========================
+# Pool / contention metrics
+# =========================
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "pool_wait_seconds": 0.0,
+    "max_pool_wait_seconds": 0.0,
+    "lock_errors": 0,
+    "statements": 0,
+    "statement_seconds": 0.0,
+}
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            with _stats_lock:
+                _stats["checkouts"] += 1
+                _stats["pool_wait_seconds"] += waited
+                _stats["max_pool_wait_seconds"] = max(_stats["max_pool_wait_seconds"], waited)
+
+
+def db_stats() -> dict:
+    """Per-process pool and contention counters (each uvicorn worker has its own)"""
+    with _stats_lock:
+        stats = dict(_stats)
+    checkouts = stats["checkouts"] or 1
+    stats["avg_pool_wait_seconds"] = stats["pool_wait_seconds"] / checkouts
+    stats["pid"] = os.getpid()
+    stats["pool_status"] = engine.pool.status()
+    return stats
+
+
 # إنشاء المحرك
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},  # مطلوب مع SQLite + FastAPI
-    pool_pre_ping=True,  # Verify connections before using
-    echo=False  # Set to True for SQL query logging
-)
+engine_args = {
+    "poolclass": TimedQueuePool,
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_pre_ping": True,  # Verify connections before using
+    "echo": False  # Set to True for SQL query logging
+}
+if DATABASE_URL.startswith("sqlite"):
+    engine_args["connect_args"] = {"check_same_thread": False}  # مطلوب مع SQLite + FastAPI
+
+engine = create_engine(DATABASE_URL, **engine_args)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    with _stats_lock:
+        _stats["statements"] += 1
+        _stats["statement_seconds"] += elapsed
+
+
+@event.listens_for(engine, "handle_error")
+def _handle_error(context):
+    # SQLite "database is locked", Postgres deadlock / lock timeout
+    message = str(context.original_exception).lower()
+    if "locked" in message or "deadlock" in message or "lock timeout" in message:
+        with _stats_lock:
+            _stats["lock_errors"] += 1
+    # The failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
 
 # جلسة قاعدة البيانات
 SessionLocal = sessionmaker(
@@ -34,3 +110,26 @@ SessionLocal = sessionmaker(
     autoflush=False,
     bind=engine
 )
+
+
+# =========================
+# Schema upgrades
+# =========================
+def add_missing_columns(metadata):
+    """Add columns and indexes that create_all() skips on tables that already exist"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(
+                        f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                    ))
+                    print(f"Added column {table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
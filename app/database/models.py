@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, DateTime
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 
@@ -21,7 +21,19 @@ class Image(Base):
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     image_url = Column(String, nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    # Metadata extracted once at upload so gallery queries never open the files
+    width = Column(Integer, index=True)
+    height = Column(Integer, index=True)
+    mode = Column(String)
+    format = Column(String, index=True)
+    byte_size = Column(BigInteger, index=True)
+    taken_at = Column(DateTime, index=True)
+    camera = Column(String, index=True)
+    has_gps = Column(Boolean, index=True)
+    dominant_color = Column(String)
+    perceptual_hash = Column(String(16), index=True)
 
     user = relationship("User", back_populates="images")
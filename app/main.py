@@ -1,50 +1,73 @@
+import time
+
+# Captured before any heavy import so the startup report covers the full cold start
+_process_start = time.perf_counter()
+
 from fastapi import FastAPI, Request, Depends
-from fastapi.responses import RedirectResponse, HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import RedirectResponse, HTMLResponse, FileResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
 import uvicorn
 import os
 
 # Routes
-from app.routes import image_routes, auth_routes
+from app.routes import image_routes, auth_routes, edit_session_routes
 
 # Database
-from app.database.db import engine, SessionLocal
+from app.database.db import engine, SessionLocal, add_missing_columns, db_stats
 from app.database.models import Base
 from app.database import crud
 
-from passlib.context import CryptContext
-import bcrypt as bcrypt_lib
+from app.services.password_service import hash_password
+from app.services.image_cache_service import image_cache
+from app.services.phash_service import similarity_index
+from app.services.export_service import stream_zip, scheduled_reencoder
+from app.services.scheduler_service import scheduler, weight_for, AdmissionError
+from app.services.rate_limit_service import retry_after_header
+from app.services.session_service import (
+    SESSION_COOKIE,
+    verify_session_token,
+    clear_session_cookie
+)
 
 # =========================
-# Password hashing
+# Startup profile
 # =========================
-# Initialize password context with error handling
-try:
-    # Try to initialize with passlib first
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    # Test the context to ensure it works
-    _ = pwd_context.hash("test")
-    USE_PASSLIB = True
-except Exception as e:
-    print(f"Warning: Failed to initialize passlib bcrypt context: {e}")
-    # Fallback to direct bcrypt
-    USE_PASSLIB = False
-    print("Using direct bcrypt library instead")
-
-def hash_password(password: str) -> str:
-    """Hash password using available method"""
-    if USE_PASSLIB:
-        return pwd_context.hash(password)
-    else:
-        # Use bcrypt directly
-        password_bytes = password.encode('utf-8')
-        if len(password_bytes) > 72:
-            raise ValueError("password cannot be longer than 72 bytes")
-        salt = bcrypt_lib.gensalt()
-        hashed = bcrypt_lib.hashpw(password_bytes, salt)
-        return hashed.decode('utf-8')
+# Seconds the app may take from import to ready before a warning is printed.
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "2.0"))
+
+startup_timings = {"imports": time.perf_counter() - _process_start}
+
+
+def _record_phase(name: str, started: float):
+    startup_timings[name] = time.perf_counter() - started
+
+
+def startup_report() -> dict:
+    """Return per-phase startup timings and whether the cold-start budget was met"""
+    total = sum(startup_timings.values())
+    return {
+        "phases": {name: round(seconds, 4) for name, seconds in startup_timings.items()},
+        "total_seconds": round(total, 4),
+        "budget_seconds": STARTUP_BUDGET_SECONDS,
+        "within_budget": total <= STARTUP_BUDGET_SECONDS,
+    }
+
+
+def print_startup_report():
+    report = startup_report()
+    print("Startup profile:")
+    for name, seconds in report["phases"].items():
+        print(f"  {name:<16} {seconds * 1000:8.1f} ms")
+    print(f"  {'total':<16} {report['total_seconds'] * 1000:8.1f} ms")
+    if not report["within_budget"]:
+        print(
+            f"Warning: startup took {report['total_seconds']:.2f}s, "
+            f"over the {STARTUP_BUDGET_SECONDS:.2f}s budget"
+        )
 
 # =========================
 # Create default admin (bcrypt)
@@ -72,7 +95,10 @@ def create_default_admin():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    started = time.perf_counter()
     create_default_admin()
+    _record_phase("default_admin", started)
+    print_startup_report()
     yield
     # Shutdown (if needed)
 
@@ -95,13 +121,16 @@ app.mount("/uploads", StaticFiles(directory="app/static/uploads", html=False), n
 # Database
 # =========================
 # Create database tables
+_tables_started = time.perf_counter()
 try:
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(Base.metadata)
     print("Database tables created successfully")
 except Exception as e:
     print(f"Error creating database tables: {e}")
     import traceback
     traceback.print_exc()
+_record_phase("create_tables", _tables_started)
 
 def get_db():
     db = SessionLocal()
@@ -121,33 +150,47 @@ async def auth_middleware(request: Request, call_next):
 
     path = request.url.path
 
+    # Verify the signed session token once per request; handlers read request.state.user
+    request.state.user = verify_session_token(request.cookies.get(SESSION_COOKIE))
+
     if (
         path in open_paths
         or any(path.startswith(p) for p in static_paths)
     ):
         return await call_next(request)
 
-    user = request.cookies.get("user")
-    if not user:
+    if request.state.user is None:
         return RedirectResponse("/login")
 
     return await call_next(request)
 
 
+# =========================
+# Load shedding
+# =========================
+@app.exception_handler(AdmissionError)
+async def admission_error_handler(request: Request, exc: AdmissionError):
+    return JSONResponse(
+        {"error": "Server busy, please retry later", "reason": exc.reason},
+        status_code=429,
+        headers=retry_after_header(exc.retry_after)
+    )
+
+
 # =========================
 # Routers
 # =========================
 # Include routers after static files mounting
 app.include_router(auth_routes.router)
 app.include_router(image_routes.router)
+app.include_router(edit_session_routes.router)
 
 # =========================
 # Root
 # =========================
 @app.get("/", response_class=HTMLResponse)
 def root(request: Request):
-    user = request.cookies.get("user")
-    if user:
+    if request.state.user:
         return RedirectResponse("/editor")
     return RedirectResponse("/login")
 
@@ -155,13 +198,8 @@ def root(request: Request):
 # Editor
 # =========================
 @app.get("/editor", response_class=HTMLResponse)
-def editor_page(request: Request, db: Session = Depends(get_db)):
-    username = request.cookies.get("user")
-    if not username:
-        return RedirectResponse("/login")
-
-    user = crud.get_user_by_username(db, username)
-    if not user:
+def editor_page(request: Request):
+    if not request.state.user:
         return RedirectResponse("/login")
 
     # Return static HTML file
@@ -174,8 +212,9 @@ def editor_page(request: Request, db: Session = Depends(get_db)):
 # Admin users page
 # =========================
 @app.get("/users", response_class=HTMLResponse)
-def users_page(request: Request, db: Session = Depends(get_db)):
-    if request.cookies.get("user") != "admin":
+def users_page(request: Request):
+    user = request.state.user
+    if not user or not user.is_admin:
         return RedirectResponse("/login")
 
     # Return static HTML file
@@ -187,54 +226,175 @@ def users_page(request: Request, db: Session = Depends(get_db)):
 @app.get("/force-logout")
 def force_logout():
     response = RedirectResponse("/login")
-    response.delete_cookie("user")
+    clear_session_cookie(response)
     return response
 
 # =========================
 # API Endpoints
 # =========================
 @app.get("/api/user")
-def get_current_user(request: Request, db: Session = Depends(get_db)):
-    username = request.cookies.get("user")
-    if not username:
-        return JSONResponse({"error": "Not authenticated"}, status_code=401)
-    
-    user = crud.get_user_by_username(db, username)
+def get_current_user(request: Request):
+    user = request.state.user
     if not user:
-        return JSONResponse({"error": "User not found"}, status_code=404)
+        return JSONResponse({"error": "Not authenticated"}, status_code=401)
     
     return JSONResponse({
         "username": user.username,
         "id": user.id
     })
 
+def image_data(img) -> dict:
+    return {
+        "id": img.id,
+        "filename": img.filename,
+        "image_url": img.image_url,
+        "created_at": img.created_at.isoformat() if img.created_at else None,
+        "width": img.width,
+        "height": img.height,
+        "mode": img.mode,
+        "format": img.format,
+        "byte_size": img.byte_size,
+        "taken_at": img.taken_at.isoformat() if img.taken_at else None,
+        "camera": img.camera,
+        "has_gps": img.has_gps,
+        "dominant_color": img.dominant_color,
+        "perceptual_hash": img.perceptual_hash
+    }
+
 @app.get("/api/images")
-def get_user_images(request: Request, db: Session = Depends(get_db)):
-    username = request.cookies.get("user")
-    if not username:
+def get_user_images(
+    request: Request,
+    format: Optional[str] = None,
+    camera: Optional[str] = None,
+    has_gps: Optional[bool] = None,
+    min_width: Optional[int] = None,
+    max_width: Optional[int] = None,
+    min_height: Optional[int] = None,
+    max_height: Optional[int] = None,
+    taken_after: Optional[datetime] = None,
+    taken_before: Optional[datetime] = None,
+    sort: str = "created_at",
+    order: str = "asc",
+    db: Session = Depends(get_db)
+):
+    user = request.state.user
+    if not user:
         return JSONResponse({"error": "Not authenticated"}, status_code=401)
+
+    if sort not in crud.IMAGE_SORT_COLUMNS:
+        return JSONResponse(
+            {"error": f"sort must be one of: {', '.join(crud.IMAGE_SORT_COLUMNS)}"},
+            status_code=400
+        )
     
-    user = crud.get_user_by_username(db, username)
-    if not user:
-        return JSONResponse({"error": "User not found"}, status_code=404)
+    filters = {
+        "format": format,
+        "camera": camera,
+        "has_gps": has_gps,
+        "min_width": min_width,
+        "max_width": max_width,
+        "min_height": min_height,
+        "max_height": max_height,
+        "taken_after": taken_after,
+        "taken_before": taken_before,
+    }
+    images = crud.get_user_images(db, user.id, filters, sort, descending=(order == "desc"))
+    images_data = [image_data(img) for img in images]
     
-    images = crud.get_user_images(db, user.id)
-    images_data = [
-        {
-            "id": img.id,
-            "filename": img.filename,
-            "image_url": img.image_url,
-            "created_at": img.created_at.isoformat() if img.created_at else None
-        }
+    return JSONResponse({"images": images_data})
+
+@app.get("/api/images/export")
+def export_images(
+    request: Request,
+    ids: Optional[str] = None,
+    after_id: int = 0,
+    max_size: Optional[int] = None,
+    quality: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    user = request.state.user
+    if not user:
+        return JSONResponse({"error": "Not authenticated"}, status_code=401)
+    if quality is not None and not 1 <= quality <= 95:
+        return JSONResponse({"error": "quality must be between 1 and 95"}, status_code=400)
+
+    images = crud.get_user_images(db, user.id, sort="created_at")
+    if ids:
+        try:
+            wanted = {int(i) for i in ids.split(",") if i.strip()}
+        except ValueError:
+            return JSONResponse({"error": "ids must be a comma separated list"}, status_code=400)
+        images = [img for img in images if img.id in wanted]
+    # after_id lets an interrupted download resume from the last complete entry
+    images = sorted((img for img in images if img.id > after_id), key=lambda img: img.id)
+
+    # Resolve paths now: the DB session is closed before the body is streamed
+    entries = [
+        (f"{img.id}_{os.path.basename(img.filename)}", "app/static" + img.image_url)
         for img in images
     ]
-    
-    return JSONResponse({"images": images_data})
+    return StreamingResponse(
+        stream_zip(entries, max_size, quality, scheduled_reencoder(user.id, weight_for(user))),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="images.zip"'}
+    )
+
+@app.get("/api/images/{image_id}/similar")
+def get_similar_images(request: Request, image_id: int, distance: int = 8, db: Session = Depends(get_db)):
+    user = request.state.user
+    if not user:
+        return JSONResponse({"error": "Not authenticated"}, status_code=401)
+
+    image = crud.get_image(db, image_id)
+    if not image or image.user_id != user.id:
+        return JSONResponse({"error": "Image not found"}, status_code=404)
+    if not image.perceptual_hash:
+        return JSONResponse({"error": "Image has no perceptual hash"}, status_code=409)
+    if not 0 <= distance <= 64:
+        return JSONResponse({"error": "distance must be between 0 and 64"}, status_code=400)
+
+    matches = similarity_index.find_similar(db, user.id, image.perceptual_hash, distance)
+    distances = {match_id: d for d, match_id in matches if match_id != image.id}
+    similar = crud.get_images_by_ids(db, list(distances)) if distances else []
+    similar_data = sorted(
+        ({**image_data(img), "distance": distances[img.id]} for img in similar),
+        key=lambda item: item["distance"]
+    )
+
+    return JSONResponse({"image_id": image.id, "similar": similar_data})
+
+@app.get("/api/startup-profile")
+def get_startup_profile(request: Request):
+    user = request.state.user
+    if not user or not user.is_admin:
+        return JSONResponse({"error": "Unauthorized - Admin only"}, status_code=403)
+    return JSONResponse(startup_report())
+
+@app.get("/api/image-cache/stats")
+def get_image_cache_stats(request: Request):
+    user = request.state.user
+    if not user or not user.is_admin:
+        return JSONResponse({"error": "Unauthorized - Admin only"}, status_code=403)
+    return JSONResponse(image_cache.stats())
+
+@app.get("/api/scheduler/stats")
+def get_scheduler_stats(request: Request):
+    user = request.state.user
+    if not user or not user.is_admin:
+        return JSONResponse({"error": "Unauthorized - Admin only"}, status_code=403)
+    return JSONResponse(scheduler.stats())
+
+@app.get("/api/db/stats")
+def get_db_stats(request: Request):
+    user = request.state.user
+    if not user or not user.is_admin:
+        return JSONResponse({"error": "Unauthorized - Admin only"}, status_code=403)
+    return JSONResponse(db_stats())
 
 @app.get("/api/users")
 def get_all_users(request: Request, db: Session = Depends(get_db)):
-    username = request.cookies.get("user")
-    if not username or username != "admin":
+    user = request.state.user
+    if not user or not user.is_admin:
         return JSONResponse({"error": "Unauthorized - Admin only"}, status_code=403)
     
     users = crud.get_all_users(db)
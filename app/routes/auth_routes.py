@@ -3,45 +3,20 @@ from fastapi.responses import RedirectResponse, FileResponse, JSONResponse
 from sqlalchemy.orm import Session
 from app.database.db import SessionLocal
 from app.database import crud
-from passlib.context import CryptContext
 import os
-import bcrypt as bcrypt_lib
-
-# Password hashing context - initialize with error handling
-try:
-    # Try to initialize with passlib first
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    # Test the context to ensure it works
-    _ = pwd_context.hash("test")
-    USE_PASSLIB = True
-except Exception as e:
-    print(f"Warning: Failed to initialize passlib bcrypt context: {e}")
-    # Fallback to direct bcrypt
-    USE_PASSLIB = False
-    print("Using direct bcrypt library instead")
-
-def hash_password(password: str) -> str:
-    """Hash password using available method"""
-    if USE_PASSLIB:
-        return pwd_context.hash(password)
-    else:
-        # Use bcrypt directly
-        password_bytes = password.encode('utf-8')
-        if len(password_bytes) > 72:
-            raise ValueError("password cannot be longer than 72 bytes")
-        salt = bcrypt_lib.gensalt()
-        hashed = bcrypt_lib.hashpw(password_bytes, salt)
-        return hashed.decode('utf-8')
-
-def verify_password(password: str, hashed: str) -> bool:
-    """Verify password using available method"""
-    if USE_PASSLIB:
-        return pwd_context.verify(password, hashed)
-    else:
-        # Use bcrypt directly
-        password_bytes = password.encode('utf-8')
-        hashed_bytes = hashed.encode('utf-8')
-        return bcrypt_lib.checkpw(password_bytes, hashed_bytes)
+
+from app.services.password_service import (
+    hash_password_async,
+    verify_password_async,
+    needs_rehash
+)
+from app.services.rate_limit_service import (
+    login_limiter,
+    register_limiter,
+    client_ip,
+    retry_after_header
+)
+from app.services.session_service import set_session_cookie, clear_session_cookie
 
 router = APIRouter()
 
@@ -72,21 +47,32 @@ async def login(
     password: str = Form(...),
     db: Session = Depends(get_db)
 ):
+    # Rate limit per client IP and per target username before doing any bcrypt work
+    retry_after = login_limiter.acquire(f"ip:{client_ip(request)}", f"user:{username}")
+    if retry_after:
+        return JSONResponse(
+            {"error": "محاولات كثيرة، يرجى المحاولة لاحقًا"},
+            status_code=429,
+            headers=retry_after_header(retry_after)
+        )
+
     user = crud.get_user_by_username(db, username)
 
-    if not user or not verify_password(password, user.password):
+    if not user or not await verify_password_async(password, user.password):
         return JSONResponse(
             {"error": "اسم المستخدم أو كلمة المرور غير صحيحة"},
             status_code=401
         )
 
+    # Upgrade the stored hash transparently when BCRYPT_ROUNDS has changed
+    if needs_rehash(user.password):
+        try:
+            crud.update_user_password(db, user, await hash_password_async(password))
+        except Exception as e:
+            print(f"Error rehashing password for {username}: {e}")
+
     response = RedirectResponse(url="/editor", status_code=302)
-    response.set_cookie(
-        key="user",
-        value=username,
-        httponly=True,
-        path="/"
-    )
+    set_session_cookie(response, user.id, user.username)
 
     return response
 
@@ -107,6 +93,14 @@ async def register(
     password: str = Form(...),
     db: Session = Depends(get_db)
 ):
+    retry_after = register_limiter.acquire(f"ip:{client_ip(request)}")
+    if retry_after:
+        return JSONResponse(
+            {"error": "محاولات كثيرة، يرجى المحاولة لاحقًا"},
+            status_code=429,
+            headers=retry_after_header(retry_after)
+        )
+
     try:
         # Validate input
         if not username or not username.strip():
@@ -139,8 +133,8 @@ async def register(
                     status_code=400
                 )
             
-            hashed_pw = hash_password(password)
-            crud.create_user(db, username.strip(), hashed_pw)
+            hashed_pw = await hash_password_async(password)
+            user = crud.create_user(db, username.strip(), hashed_pw)
         except ValueError as e:
             # Handle bcrypt-specific errors
             if "password cannot be longer than 72 bytes" in str(e):
@@ -152,12 +146,7 @@ async def register(
 
         # تسجيل تلقائي بعد التسجيل
         response = RedirectResponse(url="/editor", status_code=302)
-        response.set_cookie(
-            key="user",
-            value=username.strip(),
-            httponly=True,
-            path="/"
-        )
+        set_session_cookie(response, user.id, user.username)
 
         return response
     except Exception as e:
@@ -178,9 +167,6 @@ def logout():
     response = RedirectResponse(url="/login")
 
     # 🔴 مهم جدًا
-    response.delete_cookie(
-        key="user",
-        path="/"
-    )
+    clear_session_cookie(response)
 
     return response
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import traceback
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from app.services.edit_session_service import (
+    session_store,
+    SessionLimitError,
+    EDIT_SESSION_IDLE_SECONDS
+)
+from app.services.session_service import SESSION_COOKIE, verify_session_token
+from app.services.scheduler_service import scheduler, weight_for, AdmissionError
+
+router = APIRouter()
+
+# =========================
+# Live editing session (WebSocket)
+# =========================
+# Protocol:
+#   connect  /ws/edit?image_url=/uploads/<file>
+#   client -> {"op": "brightness", "value": 1.3}   operation delta
+#             {"action": "reset"} | {"action": "commit"}
+#   server -> binary JPEG preview frames
+#             {"type": "ready" | "committed" | "error", ...}
+# Deltas arriving while a preview is rendering are coalesced: only the latest
+# state is rendered once the current frame is sent.
+@router.websocket("/ws/edit")
+async def edit_session(websocket: WebSocket, image_url: str):
+    # HTTP middleware does not run for WebSockets, so verify the session here
+    user = verify_session_token(websocket.cookies.get(SESSION_COOKIE))
+    if not user:
+        await websocket.close(code=4401)
+        return
+
+    await websocket.accept()
+    try:
+        session = await asyncio.to_thread(session_store.open, image_url)
+    except FileNotFoundError as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=4404)
+        return
+    except OSError as e:
+        # Not a decodable image (UnidentifiedImageError) or unreadable file
+        await websocket.send_json({"type": "error", "error": f"Cannot open image: {e}"})
+        await websocket.close(code=4415)
+        return
+    except SessionLimitError as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=4429)
+        return
+
+    if session.image is None:
+        # Evicted before this connection could attach its handler
+        await websocket.close(code=1001)
+        return
+
+    await websocket.send_json({
+        "type": "ready",
+        "session_id": session.id,
+        "width": session.image.width,
+        "height": session.image.height,
+        "preview_width": session.preview.width,
+        "preview_height": session.preview.height
+    })
+
+    dirty = asyncio.Event()
+    evicted = asyncio.Event()
+    send_lock = asyncio.Lock()
+    loop = asyncio.get_running_loop()
+    # The store may evict from a worker thread; wake this connection safely
+    session.on_evict = lambda: loop.call_soon_threadsafe(evicted.set)
+
+    async def send_error(message: str, **extra):
+        async with send_lock:
+            await websocket.send_json({"type": "error", "error": message, **extra})
+
+    async def scheduled(operation: str, image, func, state: dict):
+        # Renders share the fair scheduler with the HTTP operations; the size
+        # is known from the decoded image (None once evicted, func then raises)
+        pixels = image.width * image.height if image is not None else 0
+        return await scheduler.run(
+            user.id, operation, None, func, state,
+            weight=weight_for(user), pixels=pixels
+        )
+
+    async def render_loop():
+        rendered_version = -1
+        while not evicted.is_set():
+            await dirty.wait()
+            dirty.clear()
+            if session.version == rendered_version:
+                continue
+            rendered_version = session.version
+            try:
+                frame = await scheduled("preview", session.preview, session.render_preview, dict(session.state))
+                async with send_lock:
+                    await websocket.send_bytes(frame)
+            except (WebSocketDisconnect, RuntimeError):
+                return
+            except AdmissionError as e:
+                # Over the user's share: report, wait it out, then render the latest state
+                rendered_version = -1
+                try:
+                    await send_error("Server busy", retry_after=e.retry_after)
+                except (WebSocketDisconnect, RuntimeError):
+                    return
+                await asyncio.sleep(e.retry_after)
+                dirty.set()
+            except Exception as e:
+                # Keep the session usable; the next delta triggers a fresh render
+                print(f"Live edit preview failed for {session.image_url}: {e}")
+                traceback.print_exc()
+                try:
+                    await send_error(f"Preview failed: {e}")
+                except (WebSocketDisconnect, RuntimeError):
+                    return
+
+    renderer = asyncio.create_task(render_loop())
+    evicted_waiter = asyncio.create_task(evicted.wait())
+    dirty.set()
+
+    try:
+        while True:
+            receiver = asyncio.create_task(websocket.receive_text())
+            done, _ = await asyncio.wait(
+                {receiver, evicted_waiter},
+                timeout=EDIT_SESSION_IDLE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if receiver not in done:
+                # Idle timeout or evicted to make room for other sessions
+                receiver.cancel()
+                break
+
+            try:
+                message = json.loads(receiver.result())
+                if not isinstance(message, dict):
+                    raise ValueError("Message must be a JSON object")
+            except ValueError as e:
+                await send_error(f"Invalid message: {e}")
+                continue
+
+            action = message.get("action")
+            try:
+                if action == "commit":
+                    edited_url = await scheduled("edit_commit", session.image, session.render_full, dict(session.state))
+                    async with send_lock:
+                        await websocket.send_json({
+                            "type": "committed",
+                            "edited_url": edited_url,
+                            "image_url": session.image_url
+                        })
+                    continue
+                if action == "reset":
+                    session.reset()
+                else:
+                    session.update(message.get("op"), message.get("value"))
+            except (ValueError, TypeError) as e:
+                await send_error(str(e))
+                continue
+            except SessionLimitError:
+                break
+            except AdmissionError as e:
+                await send_error("Server busy, commit again later", retry_after=e.retry_after)
+                continue
+            except Exception as e:
+                print(f"Live edit commit failed for {session.image_url}: {e}")
+                traceback.print_exc()
+                await send_error(f"Render failed: {e}")
+                continue
+            dirty.set()
+
+        await websocket.close(code=1001)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        renderer.cancel()
+        evicted_waiter.cancel()
+        session_store.close(session)
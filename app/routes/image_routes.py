@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Request, UploadFile, File, Form, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import APIRouter, Request, UploadFile, File, Form, Depends, BackgroundTasks
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, Response
 from sqlalchemy.orm import Session
 import os
+from typing import List
 from pydantic import BaseModel
 
-from app.services.image_service import save_image, rotate_image, crop_image
+from app.services.image_service import save_image, rotate_image, crop_image, crop_regions
 from app.services.image_enhancement_service import (
     adjust_brightness,
     adjust_contrast,
@@ -13,11 +14,27 @@ from app.services.image_enhancement_service import (
     generate_histogram
 )
 from app.services.compression_service import compress_jpeg
+from app.services.auto_enhance_service import auto_enhance
+from app.services.metadata_service import extract_metadata
+from app.services.phash_service import similarity_index
+from app.services.ingest_service import ingest_files
+from app.services.scheduler_service import scheduler, weight_for, AdmissionError
+from app.services.inline_service import (
+    render_inline,
+    persist_rendered,
+    new_output_name,
+    RENDERERS,
+    REQUIRED_PARAMS,
+    INLINE_FORMATS
+)
 from app.database.db import SessionLocal
 from app.database import crud
 
 router = APIRouter()
 
+# Hamming distance under which an upload is reported as a near-duplicate
+DUPLICATE_DISTANCE = int(os.getenv("DUPLICATE_DISTANCE", "2"))
+
 # =========================
 # DB dependency
 # =========================
@@ -31,11 +48,18 @@ def get_db():
 # =========================
 # Helper: require login
 # =========================
-def require_user(request: Request, db: Session):
-    username = request.cookies.get("user")
-    if not username:
-        return None
-    return crud.get_user_by_username(db, username)
+def require_user(request: Request):
+    # Populated by auth_middleware from the signed session token, no DB lookup
+    return getattr(request.state, "user", None)
+
+# =========================
+# Helper: scheduled execution
+# =========================
+async def run_operation(user, operation: str, image_url: str, func, *args):
+    """Run an image operation through the fair scheduler (AdmissionError -> 429)"""
+    return await scheduler.run(
+        user.id, operation, "app/static" + image_url, func, *args, weight=weight_for(user)
+    )
 
 # =========================
 # Upload Image
@@ -46,67 +70,115 @@ async def upload_image(
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
-    user = require_user(request, db)
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
     image_url = await save_image(file)
-    crud.create_image(db, file.filename, image_url, user.id)
+    try:
+        metadata = await run_operation(user, "metadata", image_url, extract_metadata, "app/static" + image_url)
+    except AdmissionError:
+        os.remove("app/static" + image_url)
+        raise
+
+    # Report near-duplicates already in the user's library
+    duplicates = []
+    if metadata.get("perceptual_hash"):
+        matches = similarity_index.find_similar(
+            db, user.id, metadata["perceptual_hash"], DUPLICATE_DISTANCE
+        )
+        if matches:
+            distances = {image_id: distance for distance, image_id in matches}
+            duplicates = [
+                {"id": img.id, "image_url": img.image_url, "distance": distances[img.id]}
+                for img in crud.get_images_by_ids(db, list(distances))
+            ]
+
+    image = crud.create_image(db, file.filename, image_url, user.id, metadata)
 
     return JSONResponse({
+        "id": image.id,
         "image_url": image_url,
         "edited_url": "",
+        "duplicates": sorted(duplicates, key=lambda d: d["distance"]),
         "message": "Image uploaded successfully"
     })
 
+# =========================
+# Batch upload (multiple files and/or ZIP archives)
+# =========================
+@router.post("/upload/batch")
+async def upload_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db)
+):
+    user = require_user(request)
+    if not user:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+    uploads = [(file.filename, file.file) for file in files]
+    upload_bytes = sum(file.size or 0 for file in files)
+    stored, rejected = await scheduler.run(
+        user.id, "ingest", None, ingest_files, uploads,
+        weight=weight_for(user), pixels=upload_bytes
+    )
+    images = crud.create_images_bulk(db, user.id, stored) if stored else []
+
+    return JSONResponse({
+        "images": images,
+        "rejected": rejected,
+        "message": f"{len(images)} images uploaded successfully"
+    })
+
 # =========================
 # Rotate
 # =========================
 @router.post("/rotate")
-def rotate(
+async def rotate(
     request: Request,
     image_url: str = Form(...),
-    angle: int = Form(...),
-    db: Session = Depends(get_db)
+    angle: int = Form(...)
 ):
-    user = require_user(request, db)
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
-    new_image = rotate_image(image_url, angle)
+    new_image = await run_operation(user, "rotate", image_url, rotate_image, image_url, angle)
     return JSONResponse({"edited_url": new_image, "image_url": image_url})
 
 # =========================
 # Crop
 # =========================
 @router.post("/crop")
-def crop(
+async def crop(
     request: Request,
     image_url: str = Form(...),
     x: int = Form(...),
     y: int = Form(...),
     width: int = Form(...),
-    height: int = Form(...),
-    db: Session = Depends(get_db)
+    height: int = Form(...)
 ):
-    user = require_user(request, db)
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
-    new_image = crop_image(image_url, x, y, width, height)
+    try:
+        new_image = await run_operation(user, "crop", image_url, crop_image, image_url, x, y, width, height)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
     return JSONResponse({"edited_url": new_image, "image_url": image_url})
 
 # =========================
 # Compress
 # =========================
 @router.post("/compress")
-def compress_image(
+async def compress_image(
     request: Request,
     image_url: str = Form(...),
-    quality: int = Form(...),
-    db: Session = Depends(get_db)
+    quality: int = Form(...)
 ):
-    user = require_user(request, db)
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
@@ -123,12 +195,14 @@ def compress_image(
     output_path = os.path.join(output_dir, f"compressed_{filename}")
 
     try:
-        stats = compress_jpeg(input_path, output_path, quality)
+        stats = await run_operation(user, "compress", image_url, compress_jpeg, input_path, output_path, quality)
         # Verify file was created
         if not os.path.exists(output_path):
             return JSONResponse({"error": "Failed to create compressed file"}, status_code=500)
         
         compressed_url = "/uploads/compressed/compressed_" + filename
+    except AdmissionError:
+        raise
     except Exception as e:
         return JSONResponse({"error": f"Compression failed: {str(e)}"}, status_code=500)
 
@@ -142,43 +216,43 @@ def compress_image(
 # Enhancements
 # =========================
 @router.post("/brightness")
-def brightness(request: Request, image_url: str = Form(...), factor: float = Form(...), db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def brightness(request: Request, image_url: str = Form(...), factor: float = Form(...)):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
-    new_image = adjust_brightness(image_url, factor)
+    new_image = await run_operation(user, "brightness", image_url, adjust_brightness, image_url, factor)
     return JSONResponse({"edited_url": new_image, "image_url": image_url})
 
 @router.post("/contrast")
-def contrast(request: Request, image_url: str = Form(...), factor: float = Form(...), db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def contrast(request: Request, image_url: str = Form(...), factor: float = Form(...)):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
-    new_image = adjust_contrast(image_url, factor)
+    new_image = await run_operation(user, "contrast", image_url, adjust_contrast, image_url, factor)
     return JSONResponse({"edited_url": new_image, "image_url": image_url})
 
 @router.post("/sharpen")
-def sharpen(request: Request, image_url: str = Form(...), db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def sharpen(request: Request, image_url: str = Form(...)):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
-    new_image = sharpen_image(image_url)
+    new_image = await run_operation(user, "sharpen", image_url, sharpen_image, image_url)
     return JSONResponse({"edited_url": new_image, "image_url": image_url})
 
 @router.post("/smooth")
-def smooth(request: Request, image_url: str = Form(...), db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def smooth(request: Request, image_url: str = Form(...)):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
-    new_image = smooth_image(image_url)
+    new_image = await run_operation(user, "smooth", image_url, smooth_image, image_url)
     return JSONResponse({"edited_url": new_image, "image_url": image_url})
 
 @router.post("/histogram")
-def histogram(request: Request, image_url: str = Form(...), db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def histogram(request: Request, image_url: str = Form(...)):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
-    histogram_image = generate_histogram(image_url)
+    histogram_image = await run_operation(user, "histogram", image_url, generate_histogram, image_url)
     return JSONResponse({"histogram_url": histogram_image, "image_url": image_url})
 
 # =========================
@@ -194,76 +268,121 @@ class EditRequest(BaseModel):
     y: int = None
     width: int = None
     height: int = None
+    # Inline mode only
+    format: str = "png"
+    keep: bool = False
 
 @router.post("/api/brightness")
-async def api_brightness(request: Request, data: EditRequest, db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def api_brightness(request: Request, data: EditRequest):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     
     if data.factor is None:
         return JSONResponse({"error": "factor is required"}, status_code=400)
     
-    new_image = adjust_brightness(data.image_url, data.factor)
+    new_image = await run_operation(user, "brightness", data.image_url, adjust_brightness, data.image_url, data.factor)
     return JSONResponse({"edited_url": new_image, "image_url": data.image_url})
 
 @router.post("/api/contrast")
-async def api_contrast(request: Request, data: EditRequest, db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def api_contrast(request: Request, data: EditRequest):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     
     if data.factor is None:
         return JSONResponse({"error": "factor is required"}, status_code=400)
     
-    new_image = adjust_contrast(data.image_url, data.factor)
+    new_image = await run_operation(user, "contrast", data.image_url, adjust_contrast, data.image_url, data.factor)
     return JSONResponse({"edited_url": new_image, "image_url": data.image_url})
 
 @router.post("/api/sharpen")
-async def api_sharpen(request: Request, data: EditRequest, db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def api_sharpen(request: Request, data: EditRequest):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     
-    new_image = sharpen_image(data.image_url)
+    new_image = await run_operation(user, "sharpen", data.image_url, sharpen_image, data.image_url)
     return JSONResponse({"edited_url": new_image, "image_url": data.image_url})
 
 @router.post("/api/smooth")
-async def api_smooth(request: Request, data: EditRequest, db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def api_smooth(request: Request, data: EditRequest):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     
-    new_image = smooth_image(data.image_url)
+    new_image = await run_operation(user, "smooth", data.image_url, smooth_image, data.image_url)
     return JSONResponse({"edited_url": new_image, "image_url": data.image_url})
 
 @router.post("/api/rotate")
-async def api_rotate(request: Request, data: EditRequest, db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def api_rotate(request: Request, data: EditRequest):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     
     if data.angle is None:
         return JSONResponse({"error": "angle is required"}, status_code=400)
     
-    new_image = rotate_image(data.image_url, data.angle)
+    new_image = await run_operation(user, "rotate", data.image_url, rotate_image, data.image_url, data.angle)
     return JSONResponse({"edited_url": new_image, "image_url": data.image_url})
 
 @router.post("/api/crop")
-async def api_crop(request: Request, data: EditRequest, db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def api_crop(request: Request, data: EditRequest):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     
     if data.x is None or data.y is None or data.width is None or data.height is None:
         return JSONResponse({"error": "x, y, width, height are required"}, status_code=400)
     
-    new_image = crop_image(data.image_url, data.x, data.y, data.width, data.height)
+    try:
+        new_image = await run_operation(
+            user, "crop", data.image_url, crop_image,
+            data.image_url, data.x, data.y, data.width, data.height
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
     return JSONResponse({"edited_url": new_image, "image_url": data.image_url})
 
+class CropSpec(BaseModel):
+    x: int = None
+    y: int = None
+    width: int = None
+    height: int = None
+    output_width: int = None
+    output_height: int = None
+    preset: str = None
+
+class MultiCropRequest(BaseModel):
+    image_url: str
+    crops: List[CropSpec]
+
+# Still images are decoded once for all crops. Animated sources (GIF/WebP/APNG)
+# re-decode every frame per crop, so their cost grows with the number of crops.
+@router.post("/api/crop/multi")
+async def api_crop_multi(request: Request, data: MultiCropRequest):
+    user = require_user(request)
+    if not user:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+    crops = [crop.model_dump() for crop in data.crops]
+    if not crops:
+        return JSONResponse({"error": "crops is required"}, status_code=400)
+    for crop in crops:
+        if not crop["preset"] and None in (crop["x"], crop["y"], crop["width"], crop["height"]):
+            return JSONResponse({"error": "each crop needs a preset or x, y, width, height"}, status_code=400)
+    if not os.path.exists("app/static" + data.image_url):
+        return JSONResponse({"error": "Image not found"}, status_code=404)
+
+    try:
+        results = await run_operation(user, "crop", data.image_url, crop_regions, data.image_url, crops)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"results": results, "image_url": data.image_url})
+
 @router.post("/api/compress")
-async def api_compress(request: Request, data: EditRequest, db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def api_compress(request: Request, data: EditRequest):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     
@@ -283,12 +402,16 @@ async def api_compress(request: Request, data: EditRequest, db: Session = Depend
     output_path = os.path.join(output_dir, f"compressed_{filename}")
     
     try:
-        stats = compress_jpeg(input_path, output_path, data.quality)
+        stats = await run_operation(
+            user, "compress", data.image_url, compress_jpeg, input_path, output_path, data.quality
+        )
         # Verify file was created
         if not os.path.exists(output_path):
             return JSONResponse({"error": "Failed to create compressed file"}, status_code=500)
         
         compressed_url = "/uploads/compressed/compressed_" + filename
+    except AdmissionError:
+        raise
     except Exception as e:
         return JSONResponse({"error": f"Compression failed: {str(e)}"}, status_code=500)
     
@@ -299,10 +422,59 @@ async def api_compress(request: Request, data: EditRequest, db: Session = Depend
     })
 
 @router.post("/api/histogram")
-async def api_histogram(request: Request, data: EditRequest, db: Session = Depends(get_db)):
-    user = require_user(request, db)
+async def api_histogram(request: Request, data: EditRequest):
+    user = require_user(request)
     if not user:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     
-    histogram_image = generate_histogram(data.image_url)
+    histogram_image = await run_operation(user, "histogram", data.image_url, generate_histogram, data.image_url)
     return JSONResponse({"histogram_url": histogram_image, "image_url": data.image_url})
+
+@router.post("/api/auto-enhance")
+async def api_auto_enhance(request: Request, data: EditRequest):
+    user = require_user(request)
+    if not user:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+    new_image, params = await run_operation(user, "auto_enhance", data.image_url, auto_enhance, data.image_url)
+    return JSONResponse({"edited_url": new_image, "image_url": data.image_url, "params": params})
+
+# =========================
+# Inline render (bytes in the response, no disk round trip)
+# =========================
+@router.post("/api/inline/{operation}")
+async def api_inline(request: Request, operation: str, data: EditRequest, background_tasks: BackgroundTasks):
+    user = require_user(request)
+    if not user:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+    if operation not in RENDERERS:
+        return JSONResponse({"error": f"Unknown operation: {operation}"}, status_code=404)
+    if data.format not in INLINE_FORMATS:
+        return JSONResponse(
+            {"error": f"format must be one of: {', '.join(INLINE_FORMATS)}"},
+            status_code=400
+        )
+    params = data.model_dump()
+    missing = [name for name in REQUIRED_PARAMS.get(operation, ()) if params[name] is None]
+    if missing:
+        return JSONResponse({"error": f"{', '.join(missing)} required"}, status_code=400)
+    if not os.path.exists("app/static" + data.image_url):
+        return JSONResponse({"error": "Image not found"}, status_code=404)
+
+    try:
+        body, media_type = await run_operation(
+            user, operation, data.image_url, render_inline,
+            data.image_url, operation, params, data.format, data.quality
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    headers = {"Cache-Control": "no-store"}
+    if data.keep:
+        # Persist only when asked, after the response has been sent
+        filename = new_output_name(data.format)
+        background_tasks.add_task(persist_rendered, body, filename)
+        headers["X-Edited-Url"] = f"/uploads/{filename}"
+
+    return Response(content=body, media_type=media_type, headers=headers)
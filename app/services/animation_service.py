@@ -0,0 +1,90 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+from PIL import Image, ImageSequence
+
+UPLOAD_DIR = "app/static/uploads"
+
+# =========================
+# Configuration
+# =========================
+FRAME_WORKERS = int(os.getenv("FRAME_WORKERS", str(os.cpu_count() or 2)))
+# Frames decoded ahead of the encoder; bounds memory regardless of frame count
+FRAME_WINDOW = FRAME_WORKERS * 2
+
+# Multi-frame formats Pillow can write back with save_all
+ANIMATED_FORMATS = {"GIF": "gif", "WEBP": "webp", "TIFF": "tiff", "PNG": "png"}
+# Writers that iterate append_images more than once (APNG scans modes and sizes
+# before writing), so a generator would be exhausted after the first pass
+LISTED_FORMATS = {"PNG"}
+
+_frame_executor = ThreadPoolExecutor(max_workers=FRAME_WORKERS, thread_name_prefix="frames")
+
+
+def is_animated(input_path: str) -> bool:
+    """Header-only check for a multi-frame image in a format we can re-encode"""
+    with Image.open(input_path) as image:
+        return image.format in ANIMATED_FORMATS and getattr(image, "is_animated", False)
+
+
+def _prepare(frame: Image.Image) -> Image.Image:
+    # Palette frames cannot go through enhance/filter; RGBA keeps transparency
+    if frame.mode in ("P", "PA"):
+        return frame.convert("RGBA")
+    return frame.copy()
+
+
+def _transformed_frames(source: Image.Image, transform, durations: list, disposals: list):
+    """Yield transformed frames in order, processing up to FRAME_WINDOW in parallel.
+
+    Each frame's duration and disposal are appended as it is read, so they are
+    in the lists before the frame is yielded to the encoder.
+    """
+    pending = deque()
+    for frame in ImageSequence.Iterator(source):
+        # Detach the frame from the shared decoder before handing it to a worker.
+        # This also loads it: WebP only sets the frame's duration on load.
+        detached = frame.copy()
+        durations.append(detached.info.get("duration", 0))
+        disposals.append(detached.info.get("disposal", getattr(frame, "disposal_method", 0)))
+        pending.append(_frame_executor.submit(lambda f: transform(_prepare(f)), detached))
+        if len(pending) >= FRAME_WINDOW:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+# =========================
+# Process every frame
+# =========================
+def process_animation(input_path: str, transform) -> str:
+    """Apply transform to each frame and re-encode in the source format, keeping timing"""
+    with Image.open(input_path) as source:
+        image_format = source.format
+        save_args = {
+            "format": image_format,
+            "save_all": True,
+        }
+        # Filled while frames are decoded; the encoders index these lists per
+        # frame as they write, so a single decoding pass is enough
+        durations, disposals = [], []
+        # Multi-page TIFF has no timing
+        if image_format in ("GIF", "WEBP", "PNG"):
+            save_args["duration"] = durations
+            save_args["loop"] = source.info.get("loop", 0)
+            if image_format in ("GIF", "PNG"):
+                save_args["disposal"] = disposals
+
+        frames = _transformed_frames(source, transform, durations, disposals)
+        first = next(frames)
+        if image_format in LISTED_FORMATS:
+            frames = list(frames)
+
+        filename = f"{uuid4()}.{ANIMATED_FORMATS[image_format]}"
+        output_path = os.path.join(UPLOAD_DIR, filename)
+        # Remaining frames are pulled lazily by the encoder as it writes,
+        # except where the writer needs them as a list (LISTED_FORMATS)
+        first.save(output_path, append_images=frames, **save_args)
+
+    return f"/uploads/{filename}"
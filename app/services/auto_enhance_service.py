@@ -0,0 +1,144 @@
+import math
+import os
+from uuid import uuid4
+from PIL import Image
+
+from app.services.image_cache_service import open_image
+from app.services.animation_service import is_animated, process_animation
+from app.services.color_service import to_working_space, save_kwargs, is_high_bit, to_8bit
+
+UPLOAD_DIR = "app/static/uploads"
+
+# Statistics are taken from a proxy no larger than this on its long edge
+STATS_SIZE = 512
+CLIP_PERCENT = float(os.getenv("AUTO_ENHANCE_CLIP_PERCENT", "0.5"))
+GAIN_LIMITS = (0.5, 2.0)
+GAMMA_LIMITS = (0.5, 2.0)
+TARGET_MEAN = 0.5
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _percentile(histogram, fraction):
+    total = sum(histogram)
+    threshold = total * fraction
+    running = 0
+    for value, count in enumerate(histogram):
+        running += count
+        if running > threshold:
+            return value
+    return len(histogram) - 1
+
+
+def _stretch(value, low, high):
+    return _clamp((value - low) / max(high - low, 1), 0.0, 1.0)
+
+
+# =========================
+# Statistics (one pass over a downsampled histogram)
+# =========================
+def compute_parameters(image) -> dict:
+    """Black/white points, gray-world gains and gamma from a small proxy's histogram"""
+    proxy = to_8bit(image)
+    if proxy.mode in ("RGBA", "LA"):
+        proxy = proxy.convert(proxy.mode[:-1])
+    if max(proxy.size) > STATS_SIZE:
+        proxy = proxy.reduce(math.ceil(max(proxy.size) / STATS_SIZE))
+
+    bands = len(proxy.getbands())
+    histogram = proxy.histogram()
+    channels = [histogram[i * 256:(i + 1) * 256] for i in range(bands)]
+    total = sum(channels[0]) or 1
+
+    clip = CLIP_PERCENT / 100
+    black = [_percentile(h, clip) for h in channels]
+    white = [max(_percentile(h, 1 - clip), b + 1) for h, b in zip(channels, black)]
+
+    stretched_means = [
+        sum(count * _stretch(v, lo, hi) for v, count in enumerate(h)) / total
+        for h, lo, hi in zip(channels, black, white)
+    ]
+    if bands >= 3:
+        gray = sum(stretched_means) / bands
+        gains = [_clamp(gray / m if m else 1.0, *GAIN_LIMITS) for m in stretched_means]
+    else:
+        gains = [1.0] * bands
+
+    balanced_mean = sum(
+        sum(count * min(1.0, gain * _stretch(v, lo, hi)) for v, count in enumerate(h)) / total
+        for h, lo, hi, gain in zip(channels, black, white, gains)
+    ) / bands
+    if 0.0 < balanced_mean < 1.0:
+        gamma = _clamp(math.log(TARGET_MEAN) / math.log(balanced_mean), *GAMMA_LIMITS)
+    else:
+        gamma = 1.0
+
+    return {
+        "black_point": black,
+        "white_point": white,
+        "white_balance_gains": [round(g, 4) for g in gains],
+        "gamma": round(gamma, 4),
+    }
+
+
+# =========================
+# Fused LUT application
+# =========================
+def _curve(value: float, low, high, gain, gamma) -> float:
+    """Levels, white balance and gamma for one 8-bit-scale input value, as 0..1"""
+    return min(1.0, gain * _stretch(value, low, high)) ** gamma
+
+
+def apply_parameters(image, params: dict):
+    """Apply all corrections in a single point() pass, leaving alpha untouched"""
+    black, white = params["black_point"], params["white_point"]
+    gains, gamma = params["white_balance_gains"], params["gamma"]
+
+    if is_high_bit(image):
+        if not image.mode.startswith("I;16"):
+            image = to_8bit(image)
+        else:
+            import numpy as np
+            # 16-bit LUT evaluated on the same 8-bit-scale curve
+            levels = np.arange(65536, dtype=np.float32) / 257.0
+            stretched = np.clip((levels - black[0]) / max(white[0] - black[0], 1), 0.0, 1.0)
+            lut = np.rint(np.minimum(1.0, gains[0] * stretched) ** gamma * 65535).astype(np.uint16)
+            values = np.asarray(image)
+            return Image.fromarray(lut[values].astype(values.dtype))
+
+    lut = []
+    for lo, hi, gain in zip(black, white, gains):
+        lut.extend(round(_curve(v, lo, hi, gain, gamma) * 255) for v in range(256))
+    if image.mode in ("RGBA", "LA"):
+        lut.extend(range(256))
+    return image.point(lut)
+
+
+def auto_enhance_image(image):
+    params = compute_parameters(image)
+    return apply_parameters(image, params), params
+
+
+# =========================
+# Auto enhance
+# =========================
+def auto_enhance(image_url: str):
+    """Return (edited_url, params) with the chosen corrections"""
+    input_path = "app/static" + image_url
+
+    if is_animated(input_path):
+        # One set of parameters from the first frame keeps frames consistent
+        first, _ = to_working_space(open_image(input_path))
+        params = compute_parameters(first)
+        return process_animation(input_path, lambda frame: apply_parameters(frame, params)), params
+
+    image, icc = to_working_space(open_image(input_path))
+    enhanced, params = auto_enhance_image(image)
+
+    filename = f"{uuid4()}.png"
+    output_path = os.path.join(UPLOAD_DIR, filename)
+    enhanced.save(output_path, **save_kwargs(icc))
+
+    return f"/uploads/{filename}", params
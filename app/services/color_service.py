@@ -0,0 +1,158 @@
+import io
+from functools import lru_cache
+from PIL import Image, ImageCms, ImageEnhance, ImageFilter
+
+# Single-channel modes deeper than 8 bits; Pillow's enhancers and kernels reject them.
+# Float (F) images are converted to I;16 on entry, since no output format stores them.
+HIGH_BIT_MODES = {"I;16", "I;16L", "I;16B", "I;16N", "I"}
+
+# 3x3 kernels matching ImageFilter.SHARPEN / SMOOTH, used for the NumPy path
+KERNELS = {
+    "sharpen": ((-2, -2, -2, -2, 32, -2, -2, -2, -2), 16),
+    "smooth": ((1, 1, 1, 1, 5, 1, 1, 1, 1), 13),
+}
+PIL_FILTERS = {
+    "sharpen": ImageFilter.SHARPEN,
+    "smooth": ImageFilter.SMOOTH,
+}
+
+
+# =========================
+# ICC profiles and cached transforms
+# =========================
+@lru_cache(maxsize=1)
+def _srgb_profile():
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+
+
+@lru_cache(maxsize=1)
+def srgb_icc() -> bytes:
+    return _srgb_profile().tobytes()
+
+
+@lru_cache(maxsize=32)
+def _to_srgb_transform(source_icc: bytes, in_mode: str, out_mode: str):
+    # Building an LCMS transform costs far more than applying it; memoize per profile pair
+    source = ImageCms.ImageCmsProfile(io.BytesIO(source_icc))
+    return ImageCms.buildTransform(source, _srgb_profile(), in_mode, out_mode)
+
+
+def icc_profile(image: Image.Image):
+    return image.info.get("icc_profile") or None
+
+
+def save_kwargs(icc) -> dict:
+    """Extra Image.save arguments that embed the working profile"""
+    return {"icc_profile": icc} if icc else {}
+
+
+def to_working_space(image: Image.Image):
+    """Return (image, icc) in a mode every operation supports, keeping alpha.
+
+    RGB/L/alpha/high-bit images pass through with their own profile. CMYK is
+    converted to sRGB through its embedded profile, palette images are
+    expanded to RGB(A), and float images are scaled to I;16.
+    """
+    icc = icc_profile(image)
+    if image.mode == "CMYK":
+        if icc:
+            try:
+                return ImageCms.applyTransform(image, _to_srgb_transform(icc, "CMYK", "RGB")), srgb_icc()
+            except ImageCms.PyCMSError as e:
+                print(f"ICC conversion failed, falling back to naive CMYK conversion: {e}")
+        return image.convert("RGB"), None
+    if image.mode in ("P", "PA"):
+        has_alpha = image.mode == "PA" or "transparency" in image.info
+        return image.convert("RGBA" if has_alpha else "RGB"), icc
+    if image.mode == "1":
+        return image.convert("L"), icc
+    if image.mode == "F":
+        import numpy as np
+        values = np.nan_to_num(np.asarray(image))
+        peak = max(float(values.max()), 1.0)
+        return Image.fromarray(np.clip(np.rint(values * (65535.0 / peak)), 0, 65535).astype(np.uint16)), icc
+    return image, icc
+
+
+# =========================
+# High bit-depth helpers (NumPy)
+# =========================
+def is_high_bit(image: Image.Image) -> bool:
+    return image.mode in HIGH_BIT_MODES
+
+
+def _array(image: Image.Image):
+    import numpy as np
+    return np.asarray(image).astype(np.float32)
+
+
+def _from_array(values, like: Image.Image) -> Image.Image:
+    import numpy as np
+    dtype = np.asarray(like).dtype
+    if np.issubdtype(dtype, np.integer):
+        limits = np.iinfo(dtype)
+        values = np.clip(np.rint(values), limits.min, limits.max)
+    # The dtype selects the mode (uint16 -> I;16, >u2 -> I;16B, int32 -> I)
+    return Image.fromarray(values.astype(dtype))
+
+
+def to_8bit(image: Image.Image) -> Image.Image:
+    """Scale a high bit-depth image to L for 8-bit only outputs such as JPEG"""
+    if not is_high_bit(image):
+        return image
+    import numpy as np
+    values = _array(image)
+    peak = 65535.0 if image.mode.startswith("I;16") else max(float(values.max()), 1.0)
+    return Image.fromarray(np.clip(values * (255.0 / peak), 0, 255).astype(np.uint8))
+
+
+# =========================
+# Operations (alpha and bit-depth aware)
+# =========================
+def _keep_alpha(image: Image.Image, operation) -> Image.Image:
+    # Apply operation to colour bands only so alpha edges are not blurred or sharpened
+    if image.mode in ("RGBA", "LA"):
+        alpha = image.getchannel("A")
+        result = operation(image.convert(image.mode[:-1]))
+        result.putalpha(alpha)
+        return result
+    return operation(image)
+
+
+def brightness(image: Image.Image, factor: float) -> Image.Image:
+    if is_high_bit(image):
+        return _from_array(_array(image) * factor, image)
+    # ImageEnhance keeps the alpha band of the source untouched
+    return ImageEnhance.Brightness(image).enhance(factor)
+
+
+def contrast(image: Image.Image, factor: float) -> Image.Image:
+    if is_high_bit(image):
+        values = _array(image)
+        mean = float(values.mean())
+        return _from_array(mean + (values - mean) * factor, image)
+    return ImageEnhance.Contrast(image).enhance(factor)
+
+
+def apply_filter(image: Image.Image, name: str) -> Image.Image:
+    if is_high_bit(image):
+        import numpy as np
+        kernel, scale = KERNELS[name]
+        values = _array(image)
+        height, width = values.shape
+        padded = np.pad(values, 1, mode="edge")
+        result = np.zeros_like(values)
+        for index, weight in enumerate(kernel):
+            dy, dx = divmod(index, 3)
+            result += weight * padded[dy:dy + height, dx:dx + width]
+        return _from_array(result / scale, image)
+    return _keep_alpha(image, lambda img: img.filter(PIL_FILTERS[name]))
+
+
+def flatten_alpha(image: Image.Image, background=(255, 255, 255)) -> Image.Image:
+    """Composite transparent pixels onto a background for formats without alpha"""
+    if image.mode in ("RGBA", "LA"):
+        base = Image.new("RGB", image.size, background)
+        base.paste(image.convert("RGBA"), mask=image.getchannel("A"))
+        return base
+    return image
@@ -1,17 +1,25 @@
-from PIL import Image
 import os
 
+from app.services.image_cache_service import open_image
+from app.services.color_service import to_working_space, save_kwargs, to_8bit, flatten_alpha
+
 def compress_jpeg(input_path: str, output_path: str, quality: int):
-    image = Image.open(input_path)
+    # JPEG has no alpha or 16-bit support: flatten onto white and scale to 8 bits,
+    # but keep the colour profile so colours don't shift
+    # Private copy: save() writes encoder state onto the image, which must not
+    # touch the shared cache entry when the conversions below are no-ops
+    image, icc = to_working_space(open_image(input_path, mutable=True))
+    image = flatten_alpha(to_8bit(image))
 
-    if image.mode != "RGB":
+    if image.mode not in ("RGB", "L"):
         image = image.convert("RGB")
 
     image.save(
         output_path,
         "JPEG",
         quality=quality,
-        optimize=True
+        optimize=True,
+        **save_kwargs(icc)
     )
 
     before_size = os.path.getsize(input_path)
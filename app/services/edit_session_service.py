@@ -0,0 +1,221 @@
+import io
+import os
+import threading
+import time
+from uuid import uuid4
+from PIL import Image, ImageMode
+
+from app.services.image_cache_service import open_image, image_nbytes
+from app.services.color_service import (
+    to_working_space,
+    save_kwargs,
+    brightness,
+    contrast,
+    apply_filter,
+    to_8bit,
+    flatten_alpha
+)
+
+UPLOAD_DIR = "app/static/uploads"
+
+# =========================
+# Configuration
+# =========================
+EDIT_SESSION_MEMORY_MB = int(os.getenv("EDIT_SESSION_MEMORY_MB", "512"))
+EDIT_SESSION_IDLE_SECONDS = int(os.getenv("EDIT_SESSION_IDLE_SECONDS", "300"))
+PREVIEW_MAX_SIZE = int(os.getenv("EDIT_SESSION_PREVIEW_SIZE", "1024"))
+PREVIEW_QUALITY = 80
+
+# Operations accepted as deltas; rendering always applies them in this order
+OPERATIONS = ("rotate", "brightness", "contrast", "sharpen", "smooth")
+DEFAULT_STATE = {
+    "rotate": 0,
+    "brightness": 1.0,
+    "contrast": 1.0,
+    "sharpen": False,
+    "smooth": False,
+}
+
+
+class SessionLimitError(Exception):
+    pass
+
+
+# =========================
+# Rendering
+# =========================
+def apply_operations(image: Image.Image, state: dict) -> Image.Image:
+    result = image
+    if state["rotate"] % 360:
+        result = result.rotate(-state["rotate"], expand=True)
+    if state["brightness"] != 1.0:
+        result = brightness(result, state["brightness"])
+    if state["contrast"] != 1.0:
+        result = contrast(result, state["contrast"])
+    if state["sharpen"]:
+        result = apply_filter(result, "sharpen")
+    if state["smooth"]:
+        result = apply_filter(result, "smooth")
+    return result
+
+
+class EditSession:
+    """Decoded source image and preview proxy kept in memory for one editor connection"""
+
+    def __init__(self, image_url: str, image: Image.Image):
+        self.id = str(uuid4())
+        self.image_url = image_url
+        self.image, self.icc = to_working_space(image)
+        self.preview = self.image.copy()
+        self.preview.thumbnail((PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE))
+        self.state = dict(DEFAULT_STATE)
+        self.version = 0
+        self.last_active = time.monotonic()
+        self.nbytes = image_nbytes(self.image) + image_nbytes(self.preview)
+        # Set by the connection handler; called (from any thread) when evicted
+        self.on_evict = None
+
+    def evict(self):
+        """Drop the pixel buffers and tell the owning connection to close"""
+        self.image = None
+        self.preview = None
+        if self.on_evict is not None:
+            self.on_evict()
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def update(self, op: str, value):
+        """Apply one operation delta; later values replace earlier ones for the same op"""
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {op}")
+        if op == "rotate":
+            value = int(value)
+        elif op in ("brightness", "contrast"):
+            value = float(value)
+        else:
+            value = bool(value)
+        self.state[op] = value
+        self.version += 1
+        self.touch()
+
+    def reset(self):
+        self.state = dict(DEFAULT_STATE)
+        self.version += 1
+        self.touch()
+
+    def render_preview(self, state: dict) -> bytes:
+        if self.preview is None:
+            raise SessionLimitError("Session was evicted")
+        rendered = flatten_alpha(to_8bit(apply_operations(self.preview, state)))
+        if rendered.mode not in ("RGB", "L"):
+            rendered = rendered.convert("RGB")
+        buffer = io.BytesIO()
+        rendered.save(buffer, "JPEG", quality=PREVIEW_QUALITY)
+        return buffer.getvalue()
+
+    def render_full(self, state: dict) -> str:
+        """Render at full resolution and save it like the HTTP edit endpoints do"""
+        if self.image is None:
+            raise SessionLimitError("Session was evicted")
+        rendered = apply_operations(self.image, state)
+        if rendered is self.image:
+            # Unedited: self.image may be the shared cache entry, and save()
+            # writes encoder state onto the image it is called on
+            rendered = rendered.copy()
+        filename = f"{uuid4()}.png"
+        rendered.save(os.path.join(UPLOAD_DIR, filename), **save_kwargs(self.icc))
+        return f"/uploads/{filename}"
+
+
+# =========================
+# Session store
+# =========================
+class EditSessionStore:
+    """Tracks open sessions under a byte budget, evicting idle ones first.
+
+    Evicted sessions release their buffers and their connection is told to
+    close at once, so the budget bounds what is actually held in memory.
+    """
+
+    def __init__(self, memory_mb: int, idle_seconds: int):
+        self.budget = memory_mb * 1024 * 1024
+        self.idle_seconds = idle_seconds
+        self._sessions = {}
+        # Bytes promised to sessions still decoding
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(session.nbytes for session in self._sessions.values()) + self._reserved
+
+    def _evict(self, session: EditSession):
+        del self._sessions[session.id]
+        session.evict()
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            for session in [s for s in self._sessions.values() if s.last_active < cutoff]:
+                self._evict(session)
+
+    @staticmethod
+    def _estimate_bytes(input_path: str) -> int:
+        """Header-only estimate of source + preview size in the working space"""
+        with Image.open(input_path) as header:
+            # Working space is at least RGB for colour sources (CMYK/P are converted)
+            bands = max(len(header.getbands()), 3) if header.mode not in ("L", "1") else 1
+            # High-bit sources stay high-bit: 2 (I;16) or 4 (I, F) bytes per sample
+            pixel = bands * int(ImageMode.getmode(header.mode).typestr[-1])
+            width, height = header.size
+        scale = min(1.0, PREVIEW_MAX_SIZE / max(width, height, 1))
+        return width * height * pixel + int(width * scale) * int(height * scale) * pixel
+
+    def _reserve(self, nbytes: int):
+        with self._lock:
+            if self.used_bytes + nbytes > self.budget:
+                # Reclaim from the least recently active sessions
+                for old in sorted(self._sessions.values(), key=lambda s: s.last_active):
+                    if self.used_bytes + nbytes <= self.budget:
+                        break
+                    self._evict(old)
+            if self.used_bytes + nbytes > self.budget:
+                raise SessionLimitError("Image too large for the live editing memory budget")
+            self._reserved += nbytes
+
+    def open(self, image_url: str) -> EditSession:
+        input_path = "app/static" + image_url
+        if not image_url.startswith("/uploads/") or ".." in image_url or not os.path.isfile(input_path):
+            raise FileNotFoundError(f"Image not found: {image_url}")
+
+        self.evict_idle()
+        # Check the budget before decoding anything
+        estimate = self._estimate_bytes(input_path)
+        self._reserve(estimate)
+        try:
+            session = EditSession(image_url, open_image(input_path))
+        finally:
+            with self._lock:
+                self._reserved -= estimate
+
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def is_open(self, session: EditSession) -> bool:
+        return session.id in self._sessions
+
+    def close(self, session: EditSession):
+        with self._lock:
+            self._sessions.pop(session.id, None)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "used_mb": round(self.used_bytes / (1024 * 1024), 2),
+            "budget_mb": EDIT_SESSION_MEMORY_MB,
+        }
+
+
+session_store = EditSessionStore(EDIT_SESSION_MEMORY_MB, EDIT_SESSION_IDLE_SECONDS)
@@ -0,0 +1,114 @@
+import functools
+import io
+import os
+import time
+import zipfile
+import anyio.from_thread
+from PIL import Image
+
+from app.services.scheduler_service import scheduler, AdmissionError
+
+CHUNK_SIZE = 256 * 1024
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only sink that ZipFile writes into and the response drains.
+
+    It is not seekable, so ZipFile falls back to data descriptors and never
+    needs to rewind: the archive is produced strictly front to back.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _reencoded(input_path: str, max_size: int, quality: int) -> bytes:
+    """Resize/compress one entry in memory; only one entry is held at a time.
+
+    Decoded privately rather than through the image cache: an export touches
+    every image once, which would only evict the entries editors are reusing.
+    """
+    with Image.open(input_path) as source:
+        if max_size:
+            # JPEG decodes at a reduced scale no smaller than the target
+            source.draft("RGB", (max_size, max_size))
+        image = source.convert("RGB")
+    if max_size:
+        image.thumbnail((max_size, max_size))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality or 85, optimize=True)
+    return buffer.getvalue()
+
+
+def scheduled_reencoder(user_id, weight: float = 1.0):
+    """Return a re-encode function that runs each entry through the fair scheduler.
+
+    stream_zip is iterated in a worker thread, so the scheduler is called back
+    on the event loop. A shed entry waits out Retry-After and is retried: the
+    response has already started, so the export slows down instead of failing.
+    """
+    def reencode(input_path: str, max_size: int, quality: int) -> bytes:
+        while True:
+            try:
+                return anyio.from_thread.run(functools.partial(
+                    scheduler.run, user_id, "export", input_path,
+                    _reencoded, input_path, max_size, quality, weight=weight
+                ))
+            except AdmissionError as e:
+                time.sleep(e.retry_after)
+    return reencode
+
+
+# =========================
+# Streaming ZIP export
+# =========================
+def stream_zip(entries, max_size: int = None, quality: int = None, reencode=None):
+    """Yield a ZIP of (arcname, path) entries chunk by chunk with constant memory.
+
+    Entries are stored, not deflated, since images are already compressed.
+    With max_size/quality set, each entry is re-encoded as JPEG on the fly
+    with reencode (default: inline in the streaming thread).
+    """
+    reencode = reencode or _reencoded
+    sink = _StreamBuffer()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for arcname, input_path in entries:
+            if not os.path.isfile(input_path):
+                continue
+
+            if max_size or quality:
+                try:
+                    data = reencode(input_path, max_size, quality)
+                except Exception as e:
+                    print(f"Export re-encode failed for {input_path}: {e}")
+                    continue
+                arcname = os.path.splitext(arcname)[0] + ".jpg"
+                archive.writestr(arcname, data)
+                yield sink.drain()
+                continue
+
+            info = zipfile.ZipInfo.from_file(input_path, arcname)
+            info.compress_type = zipfile.ZIP_STORED
+            with open(input_path, "rb") as source, archive.open(info, "w", force_zip64=True) as dest:
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+
+    # Central directory
+    yield sink.drain()
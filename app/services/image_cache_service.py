@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageMode
+
+# =========================
+# Configuration
+# =========================
+IMAGE_CACHE_MB = int(os.getenv("IMAGE_CACHE_MB", "256"))
+
+
+def image_nbytes(image: Image.Image) -> int:
+    """Bytes held by the decoded pixels; high-bit modes use 2 (I;16) or 4 (I, F) per sample"""
+    mode = ImageMode.getmode(image.mode)
+    return image.width * image.height * len(mode.bands) * int(mode.typestr[-1])
+
+
+# =========================
+# Decoded image LRU cache
+# =========================
+class DecodedImageCache:
+    """Byte-budgeted LRU of decoded images keyed by (path, mtime, size).
+
+    Cached images are shared between requests and must be treated as read-only:
+    Pillow transforms (enhance, filter, rotate, crop, convert) all return new
+    images, so the usual pipelines never touch the cached entry. Callers that
+    modify pixels in place ask for a private copy with mutable=True.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(path: str):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def peek(self, path: str):
+        """Return the cached decode of path if present, without decoding on a miss"""
+        key = self._key(path)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return image
+
+    def open(self, path: str, mutable: bool = False) -> Image.Image:
+        key = self._key(path)
+
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if image is None:
+            # Keep a detached copy: the opened image pins its file handle for
+            # multi-frame formats, one open fd per cache entry otherwise
+            with Image.open(path) as source:
+                source.load()
+                image = source.copy()
+            self._store(key, image)
+
+        return image.copy() if mutable else image
+
+    def _store(self, key, image: Image.Image):
+        size = image_nbytes(image)
+        if size > self.max_bytes:
+            # Larger than the whole budget: serve it uncached
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            # A newer mtime supersedes any older decode of the same file
+            for stale in [k for k in self._entries if k[0] == key[0]]:
+                self.used_bytes -= image_nbytes(self._entries.pop(stale))
+            while self._entries and self.used_bytes + size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.used_bytes -= image_nbytes(evicted)
+                self.evictions += 1
+            self._entries[key] = image
+            self.used_bytes += size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.used_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "used_mb": round(self.used_bytes / (1024 * 1024), 2),
+            "budget_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+image_cache = DecodedImageCache(IMAGE_CACHE_MB * 1024 * 1024)
+
+
+def open_image(path: str, mutable: bool = False) -> Image.Image:
+    """Return the decoded image at path, from the shared cache when possible"""
+    return image_cache.open(path, mutable=mutable)
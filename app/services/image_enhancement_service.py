@@ -1,7 +1,15 @@
 import os
 from uuid import uuid4
-from PIL import Image, ImageEnhance, ImageFilter
-import matplotlib.pyplot as plt
+
+from app.services.image_cache_service import open_image
+from app.services.animation_service import is_animated, process_animation
+from app.services.color_service import (
+    to_working_space,
+    save_kwargs,
+    brightness,
+    contrast,
+    apply_filter
+)
 
 UPLOAD_DIR = "app/static/uploads"
 
@@ -10,14 +18,17 @@ UPLOAD_DIR = "app/static/uploads"
 # =========================
 def adjust_brightness(image_url: str, factor: float):
     input_path = "app/static" + image_url
-    image = Image.open(input_path)
 
-    enhancer = ImageEnhance.Brightness(image)
-    enhanced = enhancer.enhance(factor)
+    if is_animated(input_path):
+        return process_animation(input_path, lambda frame: brightness(frame, factor))
+
+    image, icc = to_working_space(open_image(input_path))
+
+    enhanced = brightness(image, factor)
 
     filename = f"{uuid4()}.png"
     output_path = os.path.join(UPLOAD_DIR, filename)
-    enhanced.save(output_path)
+    enhanced.save(output_path, **save_kwargs(icc))
 
     return f"/uploads/{filename}"
 
@@ -27,14 +38,17 @@ def adjust_brightness(image_url: str, factor: float):
 # =========================
 def adjust_contrast(image_url: str, factor: float):
     input_path = "app/static" + image_url
-    image = Image.open(input_path)
 
-    enhancer = ImageEnhance.Contrast(image)
-    enhanced = enhancer.enhance(factor)
+    if is_animated(input_path):
+        return process_animation(input_path, lambda frame: contrast(frame, factor))
+
+    image, icc = to_working_space(open_image(input_path))
+
+    enhanced = contrast(image, factor)
 
     filename = f"{uuid4()}.png"
     output_path = os.path.join(UPLOAD_DIR, filename)
-    enhanced.save(output_path)
+    enhanced.save(output_path, **save_kwargs(icc))
 
     return f"/uploads/{filename}"
 
@@ -44,13 +58,17 @@ def adjust_contrast(image_url: str, factor: float):
 # =========================
 def sharpen_image(image_url: str):
     input_path = "app/static" + image_url
-    image = Image.open(input_path)
 
-    sharpened = image.filter(ImageFilter.SHARPEN)
+    if is_animated(input_path):
+        return process_animation(input_path, lambda frame: apply_filter(frame, "sharpen"))
+
+    image, icc = to_working_space(open_image(input_path))
+
+    sharpened = apply_filter(image, "sharpen")
 
     filename = f"{uuid4()}.png"
     output_path = os.path.join(UPLOAD_DIR, filename)
-    sharpened.save(output_path)
+    sharpened.save(output_path, **save_kwargs(icc))
 
     return f"/uploads/{filename}"
 
@@ -60,13 +78,17 @@ def sharpen_image(image_url: str):
 # =========================
 def smooth_image(image_url: str):
     input_path = "app/static" + image_url
-    image = Image.open(input_path)
 
-    smoothed = image.filter(ImageFilter.SMOOTH)
+    if is_animated(input_path):
+        return process_animation(input_path, lambda frame: apply_filter(frame, "smooth"))
+
+    image, icc = to_working_space(open_image(input_path))
+
+    smoothed = apply_filter(image, "smooth")
 
     filename = f"{uuid4()}.png"
     output_path = os.path.join(UPLOAD_DIR, filename)
-    smoothed.save(output_path)
+    smoothed.save(output_path, **save_kwargs(icc))
 
     return f"/uploads/{filename}"
 
@@ -75,20 +97,26 @@ def smooth_image(image_url: str):
 # Histogram (Optional)
 # =========================
 def generate_histogram(image_url: str):
+    # matplotlib is only needed here; importing it lazily keeps app startup fast.
+    # A Figure of its own (not pyplot's global state) keeps concurrent requests
+    # in the threadpool from drawing into each other's plot.
+    from matplotlib.figure import Figure
+
     input_path = "app/static" + image_url
-    image = Image.open(input_path).convert("RGB")
+    image = open_image(input_path).convert("RGB")
 
     r, g, b = image.split()
 
-    plt.figure()
-    plt.hist(list(r.getdata()), bins=256, color="red", alpha=0.5)
-    plt.hist(list(g.getdata()), bins=256, color="green", alpha=0.5)
-    plt.hist(list(b.getdata()), bins=256, color="blue", alpha=0.5)
+    figure = Figure()
+    axes = figure.add_subplot()
+    # Pillow counts each level; plotting the counts avoids a per-pixel list
+    levels = range(256)
+    for channel, color in ((r, "red"), (g, "green"), (b, "blue")):
+        axes.hist(levels, bins=256, range=(0, 256), weights=channel.histogram(), color=color, alpha=0.5)
 
     filename = f"{uuid4()}.png"
     output_path = os.path.join(UPLOAD_DIR, filename)
 
-    plt.savefig(output_path)
-    plt.close()
+    figure.savefig(output_path)
 
     return f"/uploads/{filename}"
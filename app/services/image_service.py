@@ -2,6 +2,10 @@ import os
 from uuid import uuid4
 from PIL import Image
 
+from app.services.image_cache_service import open_image, image_cache
+from app.services.animation_service import is_animated, process_animation
+from app.services.color_service import to_working_space, save_kwargs
+
 UPLOAD_DIR = "app/static/uploads"
 
 async def save_image(file):
@@ -21,28 +25,166 @@ async def save_image(file):
 UPLOAD_DIR = "app/static/uploads"
 def rotate_image(image_path: str, angle: int):
     full_path = f"app/static{image_path.replace('/uploads', '/uploads')}"
-    
-    image = Image.open(full_path)
+
+    if is_animated(full_path):
+        return process_animation(full_path, lambda frame: frame.rotate(-angle, expand=True))
+
+    image, icc = to_working_space(open_image(full_path))
     rotated = image.rotate(-angle, expand=True)
 
     filename = f"{uuid4()}.png"
     output_path = os.path.join(UPLOAD_DIR, filename)
 
-    rotated.save(output_path)
+    rotated.save(output_path, **save_kwargs(icc))
 
     return f"/uploads/{filename}"
 
 
-def crop_image(image_url: str, x: int, y: int, width: int, height: int):
-    input_path = "app/static" + image_url
-    image = Image.open(input_path)
-
-    cropped = image.crop((x, y, x + width, y + height))
+# =========================
+# Region-of-interest crop
+# =========================
+# Social-media presets: (aspect width, aspect height, output width, output height)
+CROP_PRESETS = {
+    "square": (1, 1, 1080, 1080),
+    "portrait": (4, 5, 1080, 1350),
+    "landscape": (1.91, 1, 1200, 628),
+    "story": (9, 16, 1080, 1920),
+}
+
+# Source format -> (extension, save options); anything else is written as PNG
+CROP_OUTPUT_FORMATS = {
+    "JPEG": ("jpg", {"quality": 95}),
+    "PNG": ("png", {}),
+    "WEBP": ("webp", {"quality": 95}),
+    "TIFF": ("tiff", {}),
+    "BMP": ("bmp", {}),
+}
+
+
+def clamp_box(image_size, x: int, y: int, width: int, height: int):
+    """Clamp a crop rectangle to the image; raise ValueError if nothing is left"""
+    image_width, image_height = image_size
+    left, top = max(0, x), max(0, y)
+    right, bottom = min(image_width, x + width), min(image_height, y + height)
+    if right <= left or bottom <= top:
+        raise ValueError("Crop area is outside the image")
+    return (left, top, right, bottom)
+
+
+def preset_box(image_size, preset: str):
+    """Largest centred box with the preset's aspect ratio, plus its output size"""
+    if preset not in CROP_PRESETS:
+        raise ValueError(f"Unknown crop preset: {preset}")
+    aspect_w, aspect_h, out_w, out_h = CROP_PRESETS[preset]
+    image_width, image_height = image_size
+    width = min(image_width, round(image_height * aspect_w / aspect_h))
+    height = min(image_height, round(width * aspect_h / aspect_w))
+    left, top = (image_width - width) // 2, (image_height - height) // 2
+    return (left, top, left + width, top + height), (out_w, out_h)
+
+
+def _resolve_crops(image_size, crops: list):
+    """Turn request dicts into (box, output size or None), validated against the header size"""
+    resolved = []
+    for crop in crops:
+        if crop.get("preset"):
+            resolved.append(preset_box(image_size, crop["preset"]))
+            continue
+        box = clamp_box(image_size, crop["x"], crop["y"], crop["width"], crop["height"])
+        output = None
+        if crop.get("output_width") and crop.get("output_height"):
+            output = (crop["output_width"], crop["output_height"])
+        resolved.append((box, output))
+    return resolved
+
+
+def _decode_region(input_path: str, resolved: list):
+    """Decode only as much of the file as the crops need.
+
+    Returns (image, scale) where scale maps full-resolution coordinates onto
+    the decoded image. A cached full decode is reused when available.
+    """
+    cached = image_cache.peek(input_path)
+    if cached is not None:
+        return cached, 1.0
 
-    filename = f"{uuid4()}.png"
-    output_path = os.path.join(UPLOAD_DIR, filename)
+    image = Image.open(input_path)
+    full_width, full_height = image.size
+
+    # Every crop is downsized: let the JPEG decoder scale by up to 8x
+    if image.format == "JPEG" and all(output for _, output in resolved):
+        factor = max(
+            max(out_w / (box[2] - box[0]), out_h / (box[3] - box[1]))
+            for box, (out_w, out_h) in resolved
+        )
+        if factor < 1:
+            image.draft(image.mode, (int(full_width * factor) + 1, int(full_height * factor) + 1))
+
+    # Files stored as several tiles/strips: skip the ones no crop touches
+    elif len(image.tile) > 1:
+        left = min(box[0] for box, _ in resolved)
+        top = min(box[1] for box, _ in resolved)
+        right = max(box[2] for box, _ in resolved)
+        bottom = max(box[3] for box, _ in resolved)
+        image.tile = [
+            tile for tile in image.tile
+            if tile[1][0] < right and tile[1][2] > left and tile[1][1] < bottom and tile[1][3] > top
+        ]
+
+    image.load()
+    return image, image.width / full_width
+
+
+def _cut(image: Image.Image, box, output):
+    """Crop box and downsize it to the output size, if one is set"""
+    cropped = image.crop(box)
+    if output and (cropped.width > output[0] or cropped.height > output[1]):
+        cropped = cropped.resize(output, Image.Resampling.LANCZOS)
+    return cropped
+
+
+def crop_regions(image_url: str, crops: list):
+    """Cut several regions from one decode; returns [{"edited_url", "box"}]"""
+    input_path = "app/static" + image_url
 
-    cropped.save(output_path)
+    # Header-only pass: validate every crop before any pixel is decoded
+    with Image.open(input_path) as header:
+        image_size = header.size
+        source_format = header.format
+    resolved = _resolve_crops(image_size, crops)
+
+    if is_animated(input_path):
+        # Frames are streamed, not kept, so each crop re-decodes the whole
+        # animation: N crops cost N decodes here, unlike the single decode below
+        return [
+            {
+                "edited_url": process_animation(
+                    input_path, lambda frame, box=box, output=output: _cut(frame, box, output)
+                ),
+                "box": list(box)
+            }
+            for box, output in resolved
+        ]
+
+    decoded, scale = _decode_region(input_path, resolved)
+    image, icc = to_working_space(decoded)
+
+    extension, options = CROP_OUTPUT_FORMATS.get(source_format, ("png", {}))
+    if extension == "jpg" and image.mode not in ("RGB", "L"):
+        extension, options = "png", {}
+
+    results = []
+    for box, output in resolved:
+        scaled = tuple(round(value * scale) for value in box)
+        cropped = _cut(image, scaled, output)
+
+        filename = f"{uuid4()}.{extension}"
+        output_path = os.path.join(UPLOAD_DIR, filename)
+        cropped.save(output_path, **options, **save_kwargs(icc))
+        results.append({"edited_url": f"/uploads/{filename}", "box": list(box)})
+    return results
 
-    return f"/uploads/{filename}"
 
+def crop_image(image_url: str, x: int, y: int, width: int, height: int):
+    crop = {"x": x, "y": y, "width": width, "height": height}
+    return crop_regions(image_url, [crop])[0]["edited_url"]
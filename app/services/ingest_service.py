@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from uuid import uuid4
+
+from app.services.metadata_service import extract_metadata
+
+UPLOAD_DIR = "app/static/uploads"
+
+# =========================
+# Configuration
+# =========================
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 2)))
+INGEST_MAX_FILES = int(os.getenv("INGEST_MAX_FILES", "1000"))
+INGEST_MAX_ENTRY_MB = int(os.getenv("INGEST_MAX_ENTRY_MB", "50"))
+
+IMAGE_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp", "tif", "tiff", "bmp"}
+COPY_BUFFER = 1024 * 1024
+
+# Metadata extraction is CPU bound, so it runs in processes and scales with cores
+_metadata_pool = None
+
+
+def _get_pool():
+    global _metadata_pool
+    if _metadata_pool is None:
+        # spawn: forking a process that runs the event loop, DB pool and executor
+        # threads can copy held locks into the child and deadlock it
+        _metadata_pool = ProcessPoolExecutor(
+            max_workers=INGEST_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _metadata_pool
+
+
+def _extension(name: str) -> str:
+    return name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+def _store(source, extension: str) -> str:
+    """Stream one file object to the uploads directory and return its URL"""
+    filename = f"{uuid4()}.{extension}"
+    with open(os.path.join(UPLOAD_DIR, filename), "wb") as buffer:
+        shutil.copyfileobj(source, buffer, COPY_BUFFER)
+    return f"/uploads/{filename}"
+
+
+def _file_size(fileobj) -> int:
+    """Size of a seekable upload without reading it"""
+    position = fileobj.tell()
+    size = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(position)
+    return size
+
+
+def _zip_entries(archive_file, rejected: list, max_bytes: int):
+    """Yield (name, file object, extension) for valid image entries of a ZIP, one at a time"""
+    with zipfile.ZipFile(archive_file) as archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith("."):
+                continue
+            extension = _extension(name)
+            if extension not in IMAGE_EXTENSIONS:
+                rejected.append({"filename": info.filename, "error": "Unsupported file type"})
+                continue
+            if info.file_size > max_bytes:
+                rejected.append({"filename": info.filename, "error": "File too large"})
+                continue
+            with archive.open(info) as entry:
+                yield name, entry, extension
+
+
+# =========================
+# Batch ingest
+# =========================
+def ingest_files(uploads):
+    """Store (filename, file object) uploads, expanding ZIP archives.
+
+    Files are written sequentially as they are read, while metadata for files
+    already on disk is extracted in the process pool. Returns (stored, rejected);
+    stored items carry filename, image_url and metadata ready for a bulk insert.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    rejected = []
+    pending = []
+    pool = _get_pool()
+    max_bytes = INGEST_MAX_ENTRY_MB * 1024 * 1024
+
+    def entries():
+        for filename, fileobj in uploads:
+            extension = _extension(filename or "")
+            if extension == "zip":
+                try:
+                    yield from _zip_entries(fileobj, rejected, max_bytes)
+                except zipfile.BadZipFile:
+                    rejected.append({"filename": filename, "error": "Invalid ZIP archive"})
+            elif extension in IMAGE_EXTENSIONS:
+                if _file_size(fileobj) > max_bytes:
+                    rejected.append({"filename": filename, "error": "File too large"})
+                    continue
+                yield filename, fileobj, extension
+            else:
+                rejected.append({"filename": filename, "error": "Unsupported file type"})
+
+    for name, fileobj, extension in entries():
+        if len(pending) >= INGEST_MAX_FILES:
+            rejected.append({"filename": name, "error": "Too many files in one batch"})
+            continue
+        image_url = _store(fileobj, extension)
+        future = pool.submit(extract_metadata, "app/static" + image_url)
+        pending.append((name, image_url, future))
+
+    stored = []
+    for name, image_url, future in pending:
+        metadata = future.result()
+        if not metadata.get("format"):
+            # Not decodable as an image: drop the file instead of keeping junk
+            os.remove("app/static" + image_url)
+            rejected.append({"filename": name, "error": "Not a valid image"})
+            continue
+        stored.append({"filename": name, "image_url": image_url, "metadata": metadata})
+    return stored, rejected
@@ -0,0 +1,85 @@
+import io
+import os
+from uuid import uuid4
+
+from app.services.image_cache_service import open_image
+from app.services.auto_enhance_service import auto_enhance_image
+from app.services.image_service import clamp_box
+from app.services.color_service import (
+    to_working_space,
+    save_kwargs,
+    brightness,
+    contrast,
+    apply_filter,
+    to_8bit,
+    flatten_alpha
+)
+
+UPLOAD_DIR = "app/static/uploads"
+
+INLINE_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+# operation -> (image, params) -> image; params come from the API EditRequest
+RENDERERS = {
+    "brightness": lambda image, p: brightness(image, p["factor"]),
+    "contrast": lambda image, p: contrast(image, p["factor"]),
+    "sharpen": lambda image, p: apply_filter(image, "sharpen"),
+    "smooth": lambda image, p: apply_filter(image, "smooth"),
+    "auto_enhance": lambda image, p: auto_enhance_image(image)[0],
+    "rotate": lambda image, p: image.rotate(-p["angle"], expand=True),
+    "crop": lambda image, p: image.crop(
+        clamp_box(image.size, p["x"], p["y"], p["width"], p["height"])
+    ),
+}
+REQUIRED_PARAMS = {
+    "brightness": ("factor",),
+    "contrast": ("factor",),
+    "rotate": ("angle",),
+    "crop": ("x", "y", "width", "height"),
+}
+
+
+# =========================
+# Render to memory
+# =========================
+def render_inline(image_url: str, operation: str, params: dict, image_format: str = "png", quality: int = None):
+    """Render one operation and return (encoded bytes, media type).
+
+    The source comes from the decoded-image cache and is shared by reference
+    with the worker thread; the encoded result goes straight into the response
+    without touching disk.
+    For animated sources this renders the first frame, as a preview.
+    """
+    input_path = "app/static" + image_url
+    image, icc = to_working_space(open_image(input_path))
+    result = RENDERERS[operation](image, params)
+
+    pil_format, media_type = INLINE_FORMATS[image_format]
+    if pil_format != "PNG":
+        result = to_8bit(result)
+    if pil_format == "JPEG":
+        result = flatten_alpha(result)
+        if result.mode not in ("RGB", "L"):
+            result = result.convert("RGB")
+
+    buffer = io.BytesIO()
+    options = save_kwargs(icc)
+    if quality is not None and pil_format != "PNG":
+        options["quality"] = quality
+    result.save(buffer, pil_format, **options)
+    return buffer.getvalue(), media_type
+
+
+def persist_rendered(data, filename: str):
+    """Write already-encoded bytes to uploads; run after the response is sent"""
+    with open(os.path.join(UPLOAD_DIR, filename), "wb") as output:
+        output.write(data)
+
+
+def new_output_name(image_format: str) -> str:
+    extension = "jpg" if image_format == "jpeg" else image_format
+    return f"{uuid4()}.{extension}"
@@ -0,0 +1,75 @@
+import os
+from datetime import datetime
+from PIL import Image
+
+from app.services.phash_service import compute_dhash
+
+# EXIF tags (see PIL.ExifTags)
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+TAG_MAKE = 271
+TAG_MODEL = 272
+TAG_DATETIME = 306
+TAG_DATETIME_ORIGINAL = 36867
+
+# Edge of the proxy used for the dominant colour; JPEG draft decodes at this scale
+DOMINANT_COLOR_SIZE = 64
+
+
+def _parse_exif_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value).strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def _dominant_color(image: Image.Image):
+    # draft() lets the JPEG decoder downscale by up to 8x, so this never
+    # decodes the full-resolution image
+    image.draft("RGB", (DOMINANT_COLOR_SIZE, DOMINANT_COLOR_SIZE))
+    proxy = image.convert("RGB")
+    proxy.thumbnail((DOMINANT_COLOR_SIZE, DOMINANT_COLOR_SIZE))
+    quantized = proxy.quantize(colors=8)
+    count, index = max(quantized.getcolors())
+    palette = quantized.getpalette()
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+# =========================
+# Metadata extraction
+# =========================
+def extract_metadata(input_path: str) -> dict:
+    """Read size, format, EXIF fields, dominant colour and dHash once at upload time"""
+    metadata = {"byte_size": os.path.getsize(input_path)}
+    try:
+        with Image.open(input_path) as image:
+            metadata.update({
+                "width": image.width,
+                "height": image.height,
+                "mode": image.mode,
+                "format": image.format,
+            })
+
+            exif = image.getexif()
+            exif_ifd = exif.get_ifd(EXIF_IFD)
+            make = str(exif.get(TAG_MAKE, "")).strip("\x00 ")
+            model = str(exif.get(TAG_MODEL, "")).strip("\x00 ")
+            camera = model if model.startswith(make) else f"{make} {model}".strip()
+            metadata.update({
+                "taken_at": _parse_exif_datetime(
+                    exif_ifd.get(TAG_DATETIME_ORIGINAL) or exif.get(TAG_DATETIME)
+                ),
+                "camera": camera or None,
+                "has_gps": bool(exif.get_ifd(GPS_IFD)),
+            })
+
+            metadata["dominant_color"] = _dominant_color(image)
+            # Reuses the reduced-scale decode; dHash only needs a 9x8 proxy
+            metadata["perceptual_hash"] = compute_dhash(image)
+    except Exception as e:
+        # Unreadable or unsupported files are still stored, just without metadata
+        print(f"Metadata extraction failed for {input_path}: {e}")
+    return metadata
@@ -0,0 +1,98 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt as bcrypt_lib
+
+# =========================
+# Configuration
+# =========================
+# bcrypt work factor; existing hashes with a different cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads dedicated to hashing so bcrypt never runs on the event loop and a
+# login burst can occupy at most this many cores
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+
+_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+
+# =========================
+# Password hashing
+# =========================
+# The passlib context is built lazily on first use and shared by every module
+# (main.py, auth_routes.py), so importing the app never pays for a bcrypt hash.
+_pwd_context = None
+_use_passlib = None
+
+
+def _get_context():
+    """Return the shared passlib context, or None if passlib bcrypt is unusable"""
+    global _pwd_context, _use_passlib
+    if _use_passlib is None:
+        try:
+            from passlib.context import CryptContext
+            _pwd_context = CryptContext(
+                schemes=["bcrypt"],
+                deprecated="auto",
+                bcrypt__rounds=BCRYPT_ROUNDS
+            )
+            # Resolve the bcrypt backend without computing a full-cost hash
+            _pwd_context.handler("bcrypt").get_backend()
+            _use_passlib = True
+        except Exception as e:
+            print(f"Warning: Failed to initialize passlib bcrypt context: {e}")
+            print("Using direct bcrypt library instead")
+            _pwd_context = None
+            _use_passlib = False
+    return _pwd_context
+
+
+def hash_password(password: str) -> str:
+    """Hash password using available method"""
+    context = _get_context()
+    if context is not None:
+        return context.hash(password)
+
+    # Use bcrypt directly
+    password_bytes = password.encode('utf-8')
+    if len(password_bytes) > 72:
+        raise ValueError("password cannot be longer than 72 bytes")
+    salt = bcrypt_lib.gensalt(rounds=BCRYPT_ROUNDS)
+    hashed = bcrypt_lib.hashpw(password_bytes, salt)
+    return hashed.decode('utf-8')
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    """Verify password using available method"""
+    context = _get_context()
+    if context is not None:
+        return context.verify(password, hashed)
+
+    # Use bcrypt directly
+    password_bytes = password.encode('utf-8')
+    hashed_bytes = hashed.encode('utf-8')
+    return bcrypt_lib.checkpw(password_bytes, hashed_bytes)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """Return True if the hash was made with a different work factor than BCRYPT_ROUNDS"""
+    # bcrypt hashes look like $2b$12$<salt+checksum>
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return True
+    return int(parts[2]) != BCRYPT_ROUNDS
+
+
+# =========================
+# Async wrappers (run on the hashing pool)
+# =========================
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, password, hashed)
@@ -0,0 +1,96 @@
+import threading
+from PIL import Image
+
+# =========================
+# Perceptual hash (dHash)
+# =========================
+HASH_SIZE = 8  # 8x8 gradient bits -> 64-bit hash
+
+
+def compute_dhash(image: Image.Image) -> str:
+    """64-bit difference hash as 16 hex chars; robust to rescaling and re-encoding"""
+    # draft() lets JPEG decode straight to a tiny grayscale proxy
+    image.draft("L", (HASH_SIZE * 4, HASH_SIZE * 4))
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{value:016x}"
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+# =========================
+# BK-tree for Hamming search
+# =========================
+class BKTree:
+    """Metric tree over hashes; a radius-k query only visits children within k of each node"""
+
+    def __init__(self):
+        self.root = None
+        self.last_id = 0
+
+    def add(self, hash_value: int, image_id: int):
+        self.last_id = max(self.last_id, image_id)
+        if self.root is None:
+            self.root = (hash_value, [image_id], {})
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(hash_value, node[0])
+            if distance == 0:
+                node[1].append(image_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (hash_value, [image_id], {})
+                return
+            node = child
+
+    def search(self, hash_value: int, max_distance: int):
+        """Return [(distance, image_id)] within max_distance, nearest first"""
+        results = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(hash_value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, image_id) for image_id in node[1])
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for d, child in node[2].items() if low <= d <= high)
+        return sorted(results)
+
+
+# =========================
+# Per-user indexes
+# =========================
+class SimilarityIndex:
+    """Lazily built per-user BK-trees, topped up from the DB with rows newer than last seen"""
+
+    def __init__(self):
+        self._trees = {}
+        self._lock = threading.Lock()
+
+    def tree_for(self, db, user_id: int) -> BKTree:
+        # Imported here to keep the service usable without the DB layer
+        from app.database import crud
+
+        with self._lock:
+            tree = self._trees.setdefault(user_id, BKTree())
+            # Rows added by this or other workers since the last query
+            for image_id, hash_hex in crud.get_image_hashes(db, user_id, after_id=tree.last_id):
+                tree.add(int(hash_hex, 16), image_id)
+            return tree
+
+    def find_similar(self, db, user_id: int, hash_hex: str, max_distance: int):
+        tree = self.tree_for(db, user_id)
+        with self._lock:
+            return tree.search(int(hash_hex, 16), max_distance)
+
+
+similarity_index = SimilarityIndex()
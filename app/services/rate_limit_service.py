@@ -0,0 +1,91 @@
+import math
+import os
+import threading
+import time
+
+# =========================
+# Token bucket rate limiter
+# =========================
+class TokenBucketLimiter:
+    """Keyed token buckets: each key holds up to `burst` tokens refilled at `rate` per second"""
+
+    def __init__(self, burst: float, per_minute: float, max_keys: int = 10000):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _refill(self, key: str, now: float):
+        tokens, updated = self._buckets.get(key, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        return tokens
+
+    def _prune(self, now: float):
+        # Drop buckets that have refilled completely; they carry no state
+        full_after = self.burst / self.rate if self.rate > 0 else math.inf
+        stale = [k for k, (_, updated) in self._buckets.items() if now - updated >= full_after]
+        for key in stale:
+            del self._buckets[key]
+
+    def acquire(self, *keys: str, tokens: float = 1.0) -> float:
+        """Take tokens from every key; return 0 if allowed, else seconds until retry"""
+        now = time.monotonic()
+        with self._lock:
+            # A request larger than the bucket can only ever wait for a full bucket
+            needed = min(tokens, float(self.burst))
+            levels = {key: self._refill(key, now) for key in keys}
+            short = [level for level in levels.values() if level < needed]
+            if short:
+                if self.rate <= 0:
+                    return math.inf
+                return max((needed - level) / self.rate for level in short)
+
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            for key, level in levels.items():
+                self._buckets[key] = (level - needed, now)
+            return 0.0
+
+
+# =========================
+# Shared limiters
+# =========================
+login_limiter = TokenBucketLimiter(
+    burst=int(os.getenv("LOGIN_RATE_LIMIT_BURST", "5")),
+    per_minute=float(os.getenv("LOGIN_RATE_LIMIT_PER_MINUTE", "10"))
+)
+
+register_limiter = TokenBucketLimiter(
+    burst=int(os.getenv("REGISTER_RATE_LIMIT_BURST", "3")),
+    per_minute=float(os.getenv("REGISTER_RATE_LIMIT_PER_MINUTE", "5"))
+)
+
+
+# Reverse proxies in front of the app, each appending one X-Forwarded-For entry.
+# 0 (direct connections) ignores the header, since clients can set it freely.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+
+def client_ip(request) -> str:
+    """Address of the client as seen by the outermost trusted proxy.
+
+    Only the rightmost TRUSTED_PROXY_HOPS entries of X-Forwarded-For were added
+    by our proxies; anything to their left is client supplied and ignored.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if TRUSTED_PROXY_HOPS <= 0:
+        return peer
+    hops = [
+        hop.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for hop in header.split(",")
+        if hop.strip()
+    ]
+    if len(hops) < TRUSTED_PROXY_HOPS:
+        return peer
+    return hops[-TRUSTED_PROXY_HOPS]
+
+
+def retry_after_header(seconds: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(min(seconds, 3600))))}
@@ -0,0 +1,207 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import defaultdict
+from PIL import Image
+from starlette.concurrency import run_in_threadpool
+
+from app.services.rate_limit_service import TokenBucketLimiter
+
+# =========================
+# Configuration
+# =========================
+SCHEDULER_MAX_CONCURRENT = int(os.getenv("SCHEDULER_MAX_CONCURRENT", str(os.cpu_count() or 2)))
+USER_MAX_CONCURRENT = int(os.getenv("USER_MAX_CONCURRENT", "2"))
+USER_MAX_QUEUED = int(os.getenv("USER_MAX_QUEUED", "8"))
+# CPU-seconds budget per user: burst size and refill per minute
+USER_CPU_BURST_SECONDS = float(os.getenv("USER_CPU_BURST_SECONDS", "30"))
+USER_CPU_SECONDS_PER_MINUTE = float(os.getenv("USER_CPU_SECONDS_PER_MINUTE", "60"))
+# Share of contended capacity an admin gets relative to a regular user
+SCHEDULER_ADMIN_WEIGHT = float(os.getenv("SCHEDULER_ADMIN_WEIGHT", "2.0"))
+
+# Initial seconds per megapixel for each operation; refined from measured runtimes
+OPERATION_COSTS = {
+    "rotate": 0.02,
+    "crop": 0.005,
+    "brightness": 0.015,
+    "contrast": 0.02,
+    "sharpen": 0.04,
+    "smooth": 0.04,
+    "compress": 0.05,
+    "histogram": 0.3,
+    "auto_enhance": 0.03,
+    "metadata": 0.01,
+    "preview": 0.02,
+    "edit_commit": 0.03,
+    "export": 0.05,
+    # Costed per uploaded megabyte: the files are not decoded before admission
+    "ingest": 0.02,
+}
+BASE_COST_SECONDS = 0.005
+CALIBRATION_WEIGHT = 0.1
+
+
+class AdmissionError(Exception):
+    """Raised when a request is shed; mapped to HTTP 429 by the app"""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def image_pixels(input_path: str) -> int:
+    """Pixel count from the file header only"""
+    try:
+        with Image.open(input_path) as image:
+            return image.width * image.height * getattr(image, "n_frames", 1)
+    except Exception:
+        return 0
+
+
+def weight_for(user) -> float:
+    return SCHEDULER_ADMIN_WEIGHT if user.is_admin else 1.0
+
+
+# =========================
+# Weighted fair scheduler
+# =========================
+class FairScheduler:
+    """Weighted fair queuing of image operations across users.
+
+    Each request is tagged with a virtual finish time of
+    max(virtual_time, user's last finish) + cost / weight, and free slots go to
+    the smallest finish tag whose user is below USER_MAX_CONCURRENT. A user
+    flooding the queue only pushes their own tags further out.
+    """
+
+    def __init__(self, max_concurrent: int, user_max_concurrent: int, user_max_queued: int):
+        self.max_concurrent = max_concurrent
+        self.user_max_concurrent = user_max_concurrent
+        self.user_max_queued = user_max_queued
+        self.cpu_quota = TokenBucketLimiter(
+            burst=USER_CPU_BURST_SECONDS,
+            per_minute=USER_CPU_SECONDS_PER_MINUTE
+        )
+        self.costs = dict(OPERATION_COSTS)
+
+        self.virtual_time = 0.0
+        self.running = 0
+        self._seq = itertools.count()
+        self._waiting = []
+        self._user_finish = {}
+        self._user_running = defaultdict(int)
+        self._user_waiting = defaultdict(int)
+
+        self.metrics = {
+            "admitted": 0,
+            "completed": 0,
+            "rejected": defaultdict(int),
+            "queue_wait_seconds": 0.0,
+            "run_seconds": 0.0,
+        }
+
+    def estimate(self, operation: str, pixels: int) -> float:
+        return BASE_COST_SECONDS + self.costs.get(operation, 0.05) * pixels / 1_000_000
+
+    def _calibrate(self, operation: str, pixels: int, seconds: float):
+        if pixels and operation in self.costs:
+            observed = max(seconds - BASE_COST_SECONDS, 0.0) / (pixels / 1_000_000)
+            self.costs[operation] += CALIBRATION_WEIGHT * (observed - self.costs[operation])
+
+    def _reject(self, reason: str, retry_after: float = 1.0):
+        self.metrics["rejected"][reason] += 1
+        raise AdmissionError(reason, retry_after)
+
+    def _dispatch(self):
+        skipped = []
+        while self._waiting and self.running < self.max_concurrent:
+            entry = heapq.heappop(self._waiting)
+            _, _, start_tag, user_id, future = entry
+            if future.done():
+                # Waiter was cancelled (client went away)
+                self._user_waiting[user_id] -= 1
+                continue
+            if self._user_running[user_id] >= self.user_max_concurrent:
+                skipped.append(entry)
+                continue
+            self._user_waiting[user_id] -= 1
+            self._user_running[user_id] += 1
+            self.running += 1
+            self.virtual_time = max(self.virtual_time, start_tag)
+            future.set_result(None)
+        for entry in skipped:
+            heapq.heappush(self._waiting, entry)
+
+    def _release(self, user_id):
+        self.running -= 1
+        self._user_running[user_id] -= 1
+        self._dispatch()
+
+    async def run(self, user_id, operation: str, input_path: str, func, *args,
+                  weight: float = 1.0, pixels: int = None):
+        """Admit, queue fairly, then run func(*args) in the threadpool.
+
+        pixels overrides the size read from input_path's header, for work that
+        is not one image on disk (previews, batch uploads).
+        """
+        if pixels is None:
+            pixels = await run_in_threadpool(image_pixels, input_path)
+        cost = self.estimate(operation, pixels)
+
+        if self._user_waiting[user_id] >= self.user_max_queued:
+            self._reject("queue_full")
+        retry_after = self.cpu_quota.acquire(f"user:{user_id}", tokens=cost)
+        if retry_after:
+            self._reject("cpu_quota", retry_after)
+
+        start_tag = max(self.virtual_time, self._user_finish.get(user_id, 0.0))
+        finish_tag = start_tag + cost / weight
+        self._user_finish[user_id] = finish_tag
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (finish_tag, next(self._seq), start_tag, user_id, future))
+        self._user_waiting[user_id] += 1
+        self.metrics["admitted"] += 1
+        queued_at = time.perf_counter()
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just before cancellation; hand it on
+                self._release(user_id)
+            else:
+                future.cancel()
+            raise
+
+        started = time.perf_counter()
+        self.metrics["queue_wait_seconds"] += started - queued_at
+        try:
+            return await run_in_threadpool(func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics["completed"] += 1
+            self.metrics["run_seconds"] += elapsed
+            self._calibrate(operation, pixels, elapsed)
+            self._release(user_id)
+
+    def stats(self) -> dict:
+        completed = self.metrics["completed"]
+        return {
+            "running": self.running,
+            "queued": sum(1 for entry in self._waiting if not entry[4].done()),
+            "max_concurrent": self.max_concurrent,
+            "admitted": self.metrics["admitted"],
+            "completed": completed,
+            "rejected": dict(self.metrics["rejected"]),
+            "avg_queue_wait_seconds": round(self.metrics["queue_wait_seconds"] / completed, 4) if completed else 0.0,
+            "avg_run_seconds": round(self.metrics["run_seconds"] / completed, 4) if completed else 0.0,
+            "seconds_per_megapixel": {op: round(cost, 5) for op, cost in self.costs.items()},
+        }
+
+
+scheduler = FairScheduler(SCHEDULER_MAX_CONCURRENT, USER_MAX_CONCURRENT, USER_MAX_QUEUED)
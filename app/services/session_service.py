@@ -0,0 +1,106 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+# =========================
+# Configuration
+# =========================
+SESSION_COOKIE = "session"
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+if not SESSION_SECRET:
+    # Sessions will not survive a restart or be shared across workers without a fixed secret
+    print("Warning: SESSION_SECRET is not set, using a random per-process secret")
+    SESSION_SECRET = secrets.token_urlsafe(32)
+_secret_bytes = SESSION_SECRET.encode("utf-8")
+
+
+class SessionUser:
+    """Authenticated user as carried by the session token (no DB lookup needed)"""
+
+    def __init__(self, id: int, username: str, role: str):
+        self.id = id
+        self.username = username
+        self.role = role
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+
+
+def role_for(username: str) -> str:
+    return "admin" if username == "admin" else "user"
+
+
+# =========================
+# Token encoding
+# =========================
+# Format: base64url(json payload) "." base64url(HMAC-SHA256(payload))
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(_secret_bytes, payload.encode("ascii"), hashlib.sha256).digest()
+    return _b64encode(digest)
+
+
+def create_session_token(user_id: int, username: str, role: str) -> str:
+    payload = _b64encode(json.dumps(
+        {"uid": user_id, "sub": username, "role": role,
+         "exp": int(time.time()) + SESSION_TTL_SECONDS},
+        separators=(",", ":")
+    ).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_session_token(token: str):
+    """Return a SessionUser for a valid, unexpired token, otherwise None"""
+    if not token or "." not in token:
+        return None
+    payload, signature = token.rsplit(".", 1)
+    try:
+        # Cookies can carry non-ASCII text; compare bytes so it fails closed
+        expected = _sign(payload).encode("ascii")
+        if not hmac.compare_digest(signature.encode("utf-8"), expected):
+            return None
+    except UnicodeError:
+        return None
+    try:
+        data = json.loads(_b64decode(payload))
+        if data["exp"] < time.time():
+            return None
+        return SessionUser(int(data["uid"]), data["sub"], data["role"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+# =========================
+# Cookie helpers
+# =========================
+def set_session_cookie(response, user_id: int, username: str):
+    response.set_cookie(
+        key=SESSION_COOKIE,
+        value=create_session_token(user_id, username, role_for(username)),
+        max_age=SESSION_TTL_SECONDS,
+        httponly=True,
+        samesite="lax",
+        path="/"
+    )
+    return response
+
+
+def clear_session_cookie(response):
+    response.delete_cookie(key=SESSION_COOKIE, path="/")
+    # Remove the legacy unsigned username cookie as well
+    response.delete_cookie(key="user", path="/")
+    return response
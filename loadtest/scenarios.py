@@ -0,0 +1,153 @@
+import abc
+import json
+import time
+import uuid
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+SAMPLE_IMAGE = "static/imgs/img2.jpeg"
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Measure /login and /register themselves, not the page they redirect to
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Client:
+    """Minimal cookie-keeping HTTP client built on urllib (no extra dependencies)"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method: str, path: str, body: bytes = None, content_type: str = None):
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        if content_type:
+            request.add_header("Content-Type", content_type)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def form(self, path: str, fields: dict):
+        return self.request(
+            "POST", path, urllib.parse.urlencode(fields).encode(),
+            "application/x-www-form-urlencoded"
+        )
+
+    def json(self, path: str, payload: dict):
+        return self.request("POST", path, json.dumps(payload).encode(), "application/json")
+
+    def upload(self, path: str, filename: str, data: bytes):
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        return self.request("POST", path, body, f"multipart/form-data; boundary={boundary}")
+
+
+def _ok(status: int) -> bool:
+    return 200 <= status < 400
+
+
+# =========================
+# Scenarios
+# =========================
+# Each scenario is set up once per virtual user and then called in a loop;
+# a step returns a list of (request name, status, seconds).
+class Scenario(abc.ABC):
+    name = ""
+
+    def __init__(self, base_url: str, username: str, password: str, image: bytes):
+        self.client = Client(base_url)
+        self.username = username
+        self.password = password
+        self.image = image
+
+    def timed(self, name: str, call):
+        started = time.perf_counter()
+        status, body = call()
+        return (name, status, time.perf_counter() - started), body
+
+    def setup(self):
+        status, _ = self.client.form("/register", {"username": self.username, "password": self.password})
+        if not _ok(status):
+            status, _ = self.client.form("/login", {"username": self.username, "password": self.password})
+        if not _ok(status):
+            raise RuntimeError(f"could not log in as {self.username} (HTTP {status})")
+
+    def upload_sample(self):
+        result, body = self.timed("upload", lambda: self.client.upload("/upload", "sample.jpeg", self.image))
+        image_url = json.loads(body).get("image_url") if _ok(result[1]) else None
+        return result, image_url
+
+    @abc.abstractmethod
+    def step(self):
+        """Run one iteration and return a list of (name, status, seconds) results"""
+
+
+class UploadScenario(Scenario):
+    name = "upload"
+
+    def step(self):
+        result, _ = self.upload_sample()
+        return [result]
+
+
+class EditChainScenario(Scenario):
+    name = "edit_chain"
+
+    def setup(self):
+        super().setup()
+        _, self.image_url = self.upload_sample()
+        if not self.image_url:
+            raise RuntimeError("upload failed during edit_chain setup")
+
+    def step(self):
+        results = []
+        for endpoint, extra in (
+            ("/api/brightness", {"factor": 1.2}),
+            ("/api/contrast", {"factor": 1.1}),
+            ("/api/rotate", {"angle": 90}),
+            ("/api/sharpen", {}),
+        ):
+            payload = {"image_url": self.image_url, **extra}
+            result, _ = self.timed(endpoint, lambda: self.client.json(endpoint, payload))
+            results.append(result)
+        return results
+
+
+class GalleryScenario(Scenario):
+    name = "gallery_browse"
+
+    def setup(self):
+        super().setup()
+        for _ in range(3):
+            self.upload_sample()
+
+    def step(self):
+        results = []
+        for query in ("", "?sort=created_at&order=desc", "?sort=width&min_width=1", "?format=JPEG"):
+            result, _ = self.timed("/api/images", lambda: self.client.request("GET", "/api/images" + query))
+            results.append(result)
+        return results
+
+
+class LoginBurstScenario(Scenario):
+    name = "login_burst"
+
+    def step(self):
+        fields = {"username": self.username, "password": self.password}
+        result, _ = self.timed("/login", lambda: self.client.form("/login", fields))
+        return [result]
+
+
+SCENARIOS = {cls.name: cls for cls in (UploadScenario, EditChainScenario, GalleryScenario, LoginBurstScenario)}
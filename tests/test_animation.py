@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image, ImageSequence, features
+
+from app.services import animation_service
+from app.services.animation_service import process_animation
+
+DURATIONS = [100, 200, 300, 400, 500]
+COLORS = ["red", "green", "blue", "yellow", "purple"]
+
+FORMATS = [
+    pytest.param("GIF", "gif", id="gif"),
+    pytest.param(
+        "WEBP", "webp", id="webp",
+        marks=pytest.mark.skipif(not features.check("webp"), reason="Pillow built without WebP"),
+    ),
+    pytest.param("PNG", "png", id="apng"),
+    pytest.param("TIFF", "tiff", id="tiff"),
+]
+
+
+def write_animation(path, image_format):
+    # Distinct colours so no encoder merges identical consecutive frames
+    frames = [Image.new("RGB", (32, 24), color) for color in COLORS]
+    args = {"format": image_format, "save_all": True, "append_images": frames[1:]}
+    if image_format != "TIFF":
+        args.update(duration=DURATIONS, loop=0)
+    frames[0].save(path, **args)
+
+
+def read_animation(path):
+    with Image.open(path) as image:
+        durations = []
+        sizes = []
+        for frame in ImageSequence.Iterator(image):
+            frame.load()
+            durations.append(frame.info.get("duration"))
+            sizes.append(frame.size)
+        return image.n_frames, durations, sizes
+
+
+@pytest.mark.parametrize("image_format, extension", FORMATS)
+def test_round_trip_keeps_frames_and_timing(tmp_path, monkeypatch, image_format, extension):
+    monkeypatch.setattr(animation_service, "UPLOAD_DIR", str(tmp_path))
+    source = tmp_path / f"source.{extension}"
+    write_animation(source, image_format)
+
+    url = process_animation(str(source), lambda frame: frame.rotate(90, expand=True))
+
+    n_frames, durations, sizes = read_animation(tmp_path / url.rsplit("/", 1)[-1])
+    assert n_frames == len(COLORS)
+    assert sizes == [(24, 32)] * len(COLORS)
+    if image_format != "TIFF":
+        assert durations == DURATIONS
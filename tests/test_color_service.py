@@ -0,0 +1,49 @@
+import io
+import warnings
+
+import pytest
+
+pytest.importorskip("PIL")
+np = pytest.importorskip("numpy")
+
+from PIL import Image
+
+from app.services.color_service import (
+    to_working_space,
+    brightness,
+    contrast,
+    apply_filter,
+    to_8bit,
+)
+
+
+def gradient(mode: str, dtype) -> Image.Image:
+    values = np.linspace(0, 4000, 64 * 48).reshape(48, 64).astype(dtype)
+    image = Image.fromarray(values)
+    assert image.mode == mode
+    return image
+
+
+@pytest.mark.parametrize("mode, dtype", [("I;16", "<u2"), ("I;16B", ">u2"), ("I", np.int32)])
+def test_high_bit_operations_keep_mode_without_warnings(mode, dtype):
+    image = gradient(mode, dtype)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        results = [
+            brightness(image, 1.5),
+            contrast(image, 1.2),
+            apply_filter(image, "sharpen"),
+            apply_filter(image, "smooth"),
+        ]
+        assert to_8bit(image).mode == "L"
+    assert all(result.mode == mode for result in results)
+
+
+def test_float_images_become_savable_16_bit():
+    image, _ = to_working_space(gradient("F", np.float32))
+    assert image.mode == "I;16"
+    assert np.asarray(image).max() == 65535
+
+    buffer = io.BytesIO()
+    brightness(image, 0.5).save(buffer, "PNG")
+    assert Image.open(buffer).mode.startswith("I")
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image
+
+from app.services import edit_session_service
+from app.services.edit_session_service import EditSession, EditSessionStore, DEFAULT_STATE
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    # Sessions resolve /uploads/<file> under app/static relative to the cwd
+    directory = tmp_path / "app" / "static" / "uploads"
+    directory.mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(edit_session_service, "UPLOAD_DIR", str(directory))
+    return directory
+
+
+def test_open_non_image_raises_oserror(uploads):
+    (uploads / "notes.png").write_text("not an image")
+    store = EditSessionStore(memory_mb=16, idle_seconds=60)
+    # The /ws/edit handler maps OSError to an error frame and close code 4415
+    with pytest.raises(OSError):
+        store.open("/uploads/notes.png")
+
+
+def test_unedited_commit_does_not_touch_source(uploads):
+    source = Image.new("RGB", (40, 30), "teal")
+    session = EditSession("/uploads/source.png", source)
+    assert session.image is source
+
+    edited_url = session.render_full(dict(DEFAULT_STATE))
+
+    assert not hasattr(source, "encoderinfo")
+    with Image.open(uploads / edited_url.rsplit("/", 1)[-1]) as saved:
+        assert saved.size == (40, 30)
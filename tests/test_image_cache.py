@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image
+
+from app.services.image_cache_service import DecodedImageCache, image_nbytes
+
+
+def open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_cached_animations_do_not_pin_files(tmp_path):
+    paths = []
+    for index in range(20):
+        path = tmp_path / f"{index}.gif"
+        frames = [Image.new("P", (8, 8), color) for color in (1, 2, 3)]
+        frames[0].save(path, save_all=True, append_images=frames[1:], duration=100)
+        paths.append(str(path))
+
+    cache = DecodedImageCache(64 * 1024 * 1024)
+    before = open_fds()
+    for path in paths:
+        cache.open(path)
+    assert cache.stats()["entries"] == len(paths)
+    assert open_fds() == before
+
+
+@pytest.mark.parametrize("mode, sample_bytes", [("L", 1), ("RGB", 1), ("I;16", 2), ("I", 4), ("F", 4)])
+def test_image_nbytes_counts_sample_width(mode, sample_bytes):
+    image = Image.new(mode, (10, 5))
+    assert image_nbytes(image) == 10 * 5 * len(image.getbands()) * sample_bytes
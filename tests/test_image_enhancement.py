@@ -0,0 +1,29 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("matplotlib")
+
+from PIL import Image
+
+from app.services.image_enhancement_service import generate_histogram
+
+
+def test_concurrent_histograms_render_independently(tmp_path, monkeypatch):
+    uploads = tmp_path / "app" / "static" / "uploads"
+    uploads.mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    for index, color in enumerate(("red", "green", "blue", "white")):
+        Image.new("RGB", (64, 48), color).save(uploads / f"{index}.png")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        urls = list(pool.map(generate_histogram, [f"/uploads/{index}.png" for index in range(4)] * 2))
+
+    assert len(set(urls)) == len(urls)
+    for url in urls:
+        with Image.open(uploads / url.rsplit("/", 1)[-1]) as histogram:
+            assert histogram.format == "PNG"
+    # The object-oriented API is used; pyplot's global figure state is never loaded
+    assert "matplotlib.pyplot" not in sys.modules
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image
+
+from app.services.image_service import crop_regions
+
+CROPS = [
+    {"preset": "square"},
+    {"x": 0, "y": 0, "width": 800, "height": 600, "output_width": 400, "output_height": 300},
+]
+EXPECTED_SIZES = [(1080, 1080), (400, 300)]
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    # Services resolve /uploads/<file> under app/static relative to the cwd
+    directory = tmp_path / "app" / "static" / "uploads"
+    directory.mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    return directory
+
+
+def output_sizes(uploads, results):
+    sizes = []
+    for result in results:
+        with Image.open(uploads / result["edited_url"].rsplit("/", 1)[-1]) as image:
+            sizes.append((image.size, getattr(image, "n_frames", 1)))
+    return sizes
+
+
+def test_still_crops_use_output_size(uploads):
+    Image.new("RGB", (1600, 1200), "orange").save(uploads / "still.jpg")
+    results = crop_regions("/uploads/still.jpg", CROPS)
+    assert output_sizes(uploads, results) == [(size, 1) for size in EXPECTED_SIZES]
+
+
+def test_animated_crops_use_output_size(uploads):
+    frames = [Image.new("RGB", (1600, 1200), color) for color in ("red", "green", "blue")]
+    frames[0].save(uploads / "anim.gif", save_all=True, append_images=frames[1:], duration=100)
+    results = crop_regions("/uploads/anim.gif", CROPS)
+    assert output_sizes(uploads, results) == [(size, 3) for size in EXPECTED_SIZES]
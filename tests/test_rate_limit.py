@@ -0,0 +1,30 @@
+import pytest
+
+pytest.importorskip("starlette")
+
+from starlette.requests import Request
+
+from app.services import rate_limit_service
+from app.services.rate_limit_service import client_ip
+
+
+def make_request(peer: str, *forwarded: str) -> Request:
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded]
+    return Request({"type": "http", "client": (peer, 12345), "headers": headers})
+
+
+def test_direct_connection_ignores_forwarded_header(monkeypatch):
+    monkeypatch.setattr(rate_limit_service, "TRUSTED_PROXY_HOPS", 0)
+    assert client_ip(make_request("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+
+
+def test_proxy_hop_uses_rightmost_entry(monkeypatch):
+    monkeypatch.setattr(rate_limit_service, "TRUSTED_PROXY_HOPS", 1)
+    # The client spoofs the left entries; the proxy appends the real address
+    request = make_request("10.0.0.2", "1.2.3.4, 5.6.7.8", "203.0.113.7")
+    assert client_ip(request) == "203.0.113.7"
+
+
+def test_missing_forwarded_header_falls_back_to_peer(monkeypatch):
+    monkeypatch.setattr(rate_limit_service, "TRUSTED_PROXY_HOPS", 1)
+    assert client_ip(make_request("10.0.0.2")) == "10.0.0.2"
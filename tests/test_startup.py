@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports the app in a fresh interpreter so nothing is already cached
+COLD_IMPORT = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "budget": app.main.STARTUP_BUDGET_SECONDS,
+    "matplotlib": "matplotlib" in sys.modules,
+}))
+"""
+
+
+def cold_import(tmp_path) -> dict:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}")
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_IMPORT],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_cold_import_within_budget(tmp_path):
+    report = cold_import(tmp_path)
+    assert report["seconds"] <= report["budget"], (
+        f"importing app.main took {report['seconds']:.2f}s, "
+        f"over the {report['budget']:.2f}s budget"
+    )
+
+
+def test_cold_import_skips_matplotlib(tmp_path):
+    # matplotlib is only needed by the histogram and must load lazily there
+    assert not cold_import(tmp_path)["matplotlib"]